@@ -1,17 +1,44 @@
 # backend/app/routers/analyze.py
 from __future__ import annotations
 
+import asyncio
 import base64
-from typing import Any, Dict, Tuple
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Request
-from starlette.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
 
-# 注意：vision_analyze_base64 是「同步」函式，不要 await
-from app.services.openai_client import vision_analyze_base64
+from app.services import admission
+from app.services import log
+from app.services import metrics
+from app.services import openai_client
+from app.services.openai_client import vision_analyze_bytes_async, vision_stream_bytes_async
 from app.services import nutrition_service_v2 as nutrition
+from app.services import image_prep
+from app.services import phash
+from app.services import semantic_match
+from app.services import vision_cache
+from app.services.singleflight import SingleFlight
+from app.services.upload import TooManyFiles, Upload, UploadTooLarge, read_upload
 
 router = APIRouter(prefix="/analyze", tags=["analyze"])
+logger = log.get_logger("eatlyze.analyze")
+
+# SSE 事件送出：emit(event, data)
+Emit = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# 同一張圖同時進來（重試、連點）時只呼叫一次模型，鍵同結果快取
+_INFLIGHT = SingleFlight()
+
+# ===== 批次分析參數 =====
+BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", "8"))       # 同時進行的視覺呼叫數
+BATCH_MAX_IMAGES = int(os.getenv("ANALYZE_BATCH_MAX_IMAGES", "100"))
+BATCH_MAX_UPLOAD_BYTES = int(os.getenv("ANALYZE_BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+# JSON（base64）批次整包解析：原始 body 與解碼後的字串會同時在記憶體裡，上限要比 multipart 低很多
+BATCH_MAX_JSON_BYTES = int(os.getenv("ANALYZE_BATCH_MAX_JSON_BYTES", str(24 * 1024 * 1024)))
 
 
 def _empty_payload() -> Dict[str, Any]:
@@ -19,38 +46,86 @@ def _empty_payload() -> Dict[str, Any]:
         "items": [],
         "totals": {"kcal": 0.0, "protein_g": 0.0, "fat_g": 0.0, "carb_g": 0.0},
         "error": None,
+        "meta": {},
     }
 
 
-def _strip_data_url_prefix(b64: str) -> str:
+async def _cache_get(key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """先查記憶體層；磁碟層有 I/O，丟到 threadpool。"""
+    hit = vision_cache.cache.get_memory(key)
+    if hit is not None:
+        return hit, "memory"
+    if vision_cache.cache.disk is not None:
+        hit = await run_in_threadpool(vision_cache.cache.get_disk, key)
+        if hit is not None:
+            return hit, "disk"
+    return None, None
+
+
+async def _cache_put(key: str, value: Dict[str, Any]) -> None:
+    if vision_cache.cache.disk is not None:
+        await run_in_threadpool(vision_cache.cache.put, key, value)
+    else:
+        vision_cache.cache.put(key, value)
+
+
+# 常見圖片格式的開頭（magic bytes）；HEIC/AVIF 在第 4~8 byte 為 'ftyp'
+_IMAGE_MAGIC = (b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"RIFF", b"BM", b"II*\x00", b"MM\x00*")
+_B64_ALPHABET = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=-_\r\n\t ")
+
+
+def _looks_binary(prefix: bytes) -> bool:
+    """只看開頭一小段判斷是二進位圖片，還是 base64 / data URL 文字。"""
+    if prefix.startswith(_IMAGE_MAGIC) or prefix[4:8] == b"ftyp":
+        return True
+    p = prefix.lstrip()
+    if p.startswith(b"data:"):
+        return False
+    return not all(c in _B64_ALPHABET for c in p[:64])
+
+
+def _b64_to_bytes(data: Any) -> bytes:
     """
-    剝掉 data URL 前綴，例如：
-    data:image/jpeg;base64,/9j/4AAQSk... -> /9j/4AAQSk...
+    剝掉 data URL 前綴後解 base64（整條流程只在這裡解一次），例如：
+    data:image/jpeg;base64,/9j/4AAQSk... -> 圖片位元組。不合法回傳空 bytes。
     """
-    if not b64:
-        return b64
-    s = b64.strip()
-    if "base64," in s:
-        return s.split("base64,", 1)[-1].strip()
-    if s.startswith("data:") and "," in s:
-        return s.split(",", 1)[-1].strip()
-    return s
+    if not data:
+        return b""
+    if isinstance(data, str):
+        data = data.encode("ascii", errors="ignore")
+    mv = memoryview(data)
+    head = bytes(mv[:256])
+    i = head.find(b"base64,")
+    if i >= 0:
+        mv = mv[i + len(b"base64,"):]
+    elif head.lstrip().startswith(b"data:") and b"," in head:
+        mv = mv[head.index(b",") + 1:]
+    try:
+        with metrics.timed("base64_decode"):
+            return base64.b64decode(mv)
+    except Exception:
+        return b""
+
+
+def _truthy(val: Any) -> bool:
+    if isinstance(val, str):
+        return val.lower() in ("1", "true", "yes", "y", "on")
+    return bool(val)
 
 
-async def _parse_image_b64(request: Request) -> Tuple[str, bool]:
+def _image_from_upload(upload: Upload, ct: str) -> Tuple[bytes, bool, Optional[str]]:
     """
-    盡量容錯地把請求體轉成 base64 字串，並回傳 include_garnish。
-    支援 JSON、multipart/form-data、octet-stream/raw。
+    從已串流收下的上傳取出圖片位元組，回傳 (圖片, include_garnish, sha256)。
+    支援 JSON、multipart/form-data、octet-stream/raw；二進位上傳不做 base64 來回轉換，
+    sha256 直接用串流時算好的值；base64 上傳則為 None（由呼叫端依解碼結果計算）。
     """
-    ct = (request.headers.get("content-type") or "").lower()
     include_garnish = False
-    print(f"[DEBUG] Content-Type: {ct}")
 
     # 1) JSON
-    if "application/json" in ct:
+    if "application/json" in ct and upload.body is not None:
         try:
-            data = await request.json()
-            print(f"[DEBUG] JSON keys: {list(data.keys()) if isinstance(data, dict) else type(data)}")
+            data = json.loads(upload.body.read() or b"null")
+            log.payload(logger, "json keys", keys=list(data) if isinstance(data, dict) else type(data).__name__)
             if isinstance(data, dict):
                 include_garnish = bool(
                     data.get("include_garnish")
@@ -64,75 +139,71 @@ async def _parse_image_b64(request: Request) -> Tuple[str, bool]:
                     or data.get("imageB64")
                     or ""
                 )
-                if isinstance(b64, bytes):
-                    b64 = b64.decode("utf-8", errors="ignore")
-                b64 = _strip_data_url_prefix(b64 or "")
-                return b64, include_garnish
+                return _b64_to_bytes(b64), include_garnish, None
         except Exception as e:
-            print(f"[WARN] JSON parse failed: {type(e).__name__}: {e}")
+            logger.warning("json parse failed", extra={"error": f"{type(e).__name__}: {e}"})
 
     # 2) multipart/form-data
     if "multipart/form-data" in ct:
-        try:
-            form = await request.form()
-            print(f"[DEBUG] multipart fields: {list(form.keys())}")
-
-            ig_val = form.get("include_garnish") or form.get("includeGarnish")
-            if isinstance(ig_val, str):
-                include_garnish = ig_val.lower() in ("1", "true", "yes", "y", "on")
-            elif ig_val is not None:
-                include_garnish = bool(ig_val)
-
-            # 常見檔案欄位：file / image
-            upload = form.get("file") or form.get("image")
-            if upload is not None and hasattr(upload, "read"):
-                content: bytes = await upload.read()
-                print(f"[DEBUG] multipart binary size: {len(content)}")
-                return base64.b64encode(content).decode("ascii"), include_garnish
-
-            # 也支援直接 base64 欄位
-            b64 = (
-                form.get("image_base64")
-                or form.get("imageBase64")
-                or form.get("image_b64")
-                or form.get("imageB64")
-                or ""
-            )
-            if isinstance(b64, bytes):
-                b64 = b64.decode("utf-8", errors="ignore")
-            b64 = _strip_data_url_prefix(b64 or "")
-            print(f"[DEBUG] multipart base64 length: {len(b64)}")
-            return b64, include_garnish
-        except Exception as e:
-            print(f"[WARN] multipart parse failed: {type(e).__name__}: {e}")
+        form = upload.fields
+        log.payload(logger, "multipart", fields=list(form), files=[f.name for f in upload.files])
 
-    # 3) 其他（octet-stream 或 raw）
-    try:
-        raw = await request.body()  # bytes
-        if not raw:
-            print("[DEBUG] raw body empty")
-            return "", include_garnish
+        ig_val = form.get("include_garnish") or form.get("includeGarnish")
+        if ig_val is not None:
+            include_garnish = _truthy(ig_val)
 
-        # 嘗試把 bytes 解成文字（若本來就是 base64 字串或 data-url）
-        text = b""
-        try:
-            text = raw.decode("utf-8", errors="ignore").strip()
-        except Exception:
-            text = b""
+        # 常見檔案欄位：file / image
+        files = {f.name: f for f in upload.files}
+        part = files.get("file") or files.get("image")
+        if part is not None:
+            logger.debug("multipart binary", extra={"bytes": part.size})
+            return part.read(), include_garnish, part.sha256()
+
+        # 也支援直接 base64 欄位
+        b64 = (
+            form.get("image_base64")
+            or form.get("imageBase64")
+            or form.get("image_b64")
+            or form.get("imageB64")
+            or ""
+        )
+        image = _b64_to_bytes(b64)
+        logger.debug("multipart base64", extra={"bytes": len(image)})
+        return image, include_garnish, None
 
-        if isinstance(text, str) and text:
-            looks_like_b64 = (text.startswith("data:") and "," in text) or len(text) > 32
-            print(f"[DEBUG] raw->text len={len(text)}, looks_like_b64={looks_like_b64}")
-            if looks_like_b64:
-                return _strip_data_url_prefix(text), include_garnish
+    # 3) 其他（octet-stream 或 raw）
+    if upload.body is None or not upload.body.size:
+        logger.debug("raw body empty")
+        return b"", include_garnish, None
+    raw = upload.body.read()
+
+    # 只看開頭判斷：二進位直接用，base64 字串或 data-url 才解碼
+    if _looks_binary(raw[:64]):
+        logger.debug("raw binary", extra={"bytes": len(raw)})
+        return raw, include_garnish, upload.body.sha256()
+    image = _b64_to_bytes(raw)
+    logger.debug("raw base64", extra={"bytes": len(image)})
+    return image, include_garnish, None
 
-        # 直接把二進位轉 base64
-        print(f"[DEBUG] raw binary size: {len(raw)}")
-        return base64.b64encode(raw).decode("ascii"), include_garnish
 
+async def _parse_image(request: Request) -> Tuple[bytes, bool, Optional[str]]:
+    """
+    串流讀取請求（超過 MAX_UPLOAD_BYTES 時丟 UploadTooLarge → 413），再取出圖片。
+    """
+    ct = (request.headers.get("content-type") or "").lower()
+    try:
+        with metrics.timed("body_read"):
+            upload = await read_upload(request)
+    except UploadTooLarge:
+        raise
     except Exception as e:
-        print(f"[WARN] body read failed: {type(e).__name__}: {e}")
-        return "", include_garnish
+        logger.warning("body read failed", extra={"content_type": ct, "error": f"{type(e).__name__}: {e}"})
+        return b"", False, None
+    try:
+        with metrics.timed("body_parse"):
+            return _image_from_upload(upload, ct)
+    finally:
+        upload.close()
 
 
 @router.get("/ping")
@@ -140,47 +211,416 @@ async def ping():
     return {"ok": True, "route": "/analyze/image"}
 
 
+@router.get("/metrics")
+async def runtime_metrics() -> Dict[str, Any]:
+    """視覺呼叫與快取的執行狀態（斷路器、對沖、快取命中、名稱解析 memo）。"""
+    out: Dict[str, Any] = {
+        "breakers": openai_client.breaker_stats(),
+        "singleflight": _INFLIGHT.stats(),
+        "admission": admission.limiter.stats(),
+        "hedge": openai_client.hedge_stats(),
+        "vision_cache": await run_in_threadpool(vision_cache.cache.stats),
+        "nutrition_memo": nutrition.memo_stats(),
+    }
+    if phash.enabled():
+        out["phash"] = phash.index.stats()
+    if semantic_match.enabled():
+        out["semantic"] = semantic_match.matcher.stats()
+    return out
+
+
+async def _stream_vision(prepared: image_prep.PreparedImage, tokens: int, emit: Emit) -> Dict[str, Any]:
+    """串流呼叫模型：每個暫定 item 送出 vision_item 事件，回傳最終結果。"""
+    result: Dict[str, Any] = {"items": [], "model": None, "error": "no_result"}
+    async for ev in vision_stream_bytes_async(prepared.data, prepared.mime, prepared.detail, tokens):
+        if ev["type"] == "item":
+            await emit("vision_item", {"item": ev["item"], "model": ev["model"]})
+        elif ev["type"] == "retry":
+            await emit("vision_reset", {"model": ev["model"]})
+        else:
+            result = ev
+    return result
+
+
+async def _fetch_vision(
+    raw: bytes,
+    cache_key: str,
+    include_garnish: bool,
+    img_hash: Optional[int],
+    emit: Optional[Emit],
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """前處理 + 呼叫模型，成功時寫入快取；回傳 (結果, 前處理 metrics)。"""
+    # 送模型前先縮圖/重壓（CPU 工作丟 threadpool）
+    with metrics.timed("preprocess"):
+        prepared = await run_in_threadpool(image_prep.prepare, raw)
+    del raw  # 之後只需要前處理後的圖，原圖讓 GC 回收
+    logger.debug("image prep", extra=prepared.metrics())
+    if emit is not None:
+        await emit("preprocessed", prepared.metrics())
+
+    # 非同步呼叫，不阻塞 event loop；base64 只在送出前編碼一次
+    # 依前處理後的尺寸估 token，供 admission 的 TPM 預算使用
+    tokens = admission.estimate_tokens(prepared.width, prepared.height, prepared.detail)
+    with metrics.timed("vision"):
+        if emit is not None:
+            result = await _stream_vision(prepared, tokens, emit)
+        else:
+            result = await vision_analyze_bytes_async(
+                prepared.data, prepared.mime, prepared.detail, tokens
+            )  # returns dict: {items, model, error}
+    logger.debug("vision result", extra={"model": result.get("model"), "vision_error": result.get("error")})
+    log.payload(logger, "vision items", items=result.get("items"))
+    if not result.get("error"):
+        value = {"items": result.get("items") or [], "model": result.get("model")}
+        await _cache_put(cache_key, value)
+        if img_hash is not None:
+            phash.index.add(img_hash, include_garnish, value)
+    return result, prepared.metrics()
+
+
+async def _vision_items(
+    raw: bytes,
+    include_garnish: bool,
+    digest: Optional[str],
+    payload: Dict[str, Any],
+    emit: Optional[Emit] = None,
+) -> List[Dict[str, Any]]:
+    """
+    視覺辨識（含結果快取、感知雜湊、前處理）；錯誤與 meta 寫進 payload。
+    有 emit 時（SSE）改用串流呼叫，並送出 preprocessed / vision_item 事件。
+    """
+    # 同一張圖（同 include_garnish、同模型/提示版本）直接用快取
+    with metrics.timed("cache_lookup"):
+        cache_key = vision_cache.make_key(raw, include_garnish, digest)
+        cached, tier = await _cache_get(cache_key)
+
+    # 位元組不同但畫面幾乎相同（連拍、重新壓縮）→ 感知雜湊近似命中
+    img_hash: Optional[int] = None
+    if cached is None and phash.enabled():
+        with metrics.timed("phash"):
+            img_hash = await run_in_threadpool(phash.dhash, raw)
+            near = phash.index.lookup(img_hash, include_garnish) if img_hash is not None else None
+        if near is not None:
+            cached, distance = near
+            tier = "phash"
+            payload["meta"] = {"phash_distance": distance, "similarity": phash.similarity(distance)}
+
+    if cached is not None:
+        detected_items = list(cached.get("items") or [])
+        payload["meta"] = {**payload["meta"], "cache": tier, "model": cached.get("model")}
+        metrics.VISION_CACHE_TOTAL.inc(result=tier)
+        logger.debug("vision cache hit", extra={"tier": tier, "n_items": len(detected_items)})
+        return detected_items
+
+    # 快取未命中：同一張圖若已有請求在跑，等它的結果（single-flight）
+    try:
+        (result, image_meta), shared = await _INFLIGHT.do(
+            cache_key, _fetch_vision, raw, cache_key, include_garnish, img_hash, emit
+        )
+    except Exception as e:
+        payload["error"] = f"vision_error:{type(e).__name__}"
+        logger.error("vision failed", extra={"error": f"{type(e).__name__}: {e}"})
+        return []
+
+    detected_items = list(result.get("items") or [])
+    payload["meta"]["image"] = image_meta
+    payload["meta"].update(cache="coalesced" if shared else "miss", model=result.get("model"))
+    metrics.VISION_CACHE_TOTAL.inc(result=payload["meta"]["cache"])
+    error = result.get("error")
+    if error:
+        # 被 admission 拒絕時保留 overloaded:<reason>（/analyze/image 回 503）
+        payload["error"] = error if str(error).startswith("overloaded:") else f"vision_error:{error}"
+    return detected_items
+
+
+async def _calc(items: List[Dict[str, Any]], include_garnish: bool) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    # 語意比對可能要呼叫 embeddings API（網路 I/O）；食物表還在暖機時第一次查詢要等載入完成。
+    # 這兩種情況都丟到 threadpool，不卡 event loop
+    if semantic_match.enabled() or not nutrition.is_loaded():
+        return await run_in_threadpool(nutrition.calc, items, include_garnish=include_garnish)
+    return nutrition.calc(items, include_garnish=include_garnish)
+
+
+async def _analyze_one(raw: bytes, include_garnish: bool, digest: Optional[str] = None) -> Dict[str, Any]:
+    """單張圖：視覺辨識 → 營養計算，回傳與 /analyze/image 相同格式的 payload。"""
+    payload = _empty_payload()
+    if not raw:
+        payload["error"] = "no_image"
+        return payload
+
+    # 1) 視覺辨識
+    detected_items = await _vision_items(raw, include_garnish, digest, payload)
+    del raw
+
+    # 2) 營養計算
+    try:
+        with metrics.timed("nutrition"):
+            enriched, totals = await _calc(detected_items, include_garnish)
+        payload["items"] = enriched
+        payload["totals"] = totals
+        logger.debug("nutrition totals", extra={"totals": totals})
+    except Exception as e:
+        payload["error"] = f"nutrition_error:{type(e).__name__}"
+        logger.exception("nutrition failed")
+    return payload
+
+
+def _want_timings(request: Request) -> bool:
+    return _truthy(request.query_params.get("timings") or "")
+
+
+def _json_response(payload: Dict[str, Any], status_code: int = 200, **kw: Any) -> JSONResponse:
+    # JSONResponse 在建構時序列化，這段即為 response serialization 的耗時
+    with metrics.timed("serialize"):
+        return JSONResponse(payload, status_code=status_code, **kw)
+
+
+def _overloaded(payload: Dict[str, Any]) -> bool:
+    return str(payload.get("error") or "").startswith("overloaded:")
+
+
+def _too_large(e: UploadTooLarge) -> JSONResponse:
+    payload = _empty_payload()
+    payload["error"] = "payload_too_large"
+    payload["meta"] = {"max_bytes": e.limit}
+    logger.warning("upload rejected", extra={"max_bytes": e.limit})
+    return JSONResponse(payload, status_code=413)
+
+
 @router.post("/image")
 async def analyze_image(request: Request) -> JSONResponse:
-    print("=== /analyze/image called ===")
+    """?timings=1 時回應附上各階段耗時（毫秒）。"""
     payload = _empty_payload()
+    timing_token = metrics.start_request()
 
     try:
-        image_b64, include_garnish = await _parse_image_b64(request)
-        print(f"[DEBUG] base64 length after parse: {len(image_b64)} ; include_garnish={include_garnish}")
-        if not image_b64:
-            payload["error"] = "no_image"
-            return JSONResponse(payload, status_code=200)
+        try:
+            raw, include_garnish, digest = await _parse_image(request)
+        except UploadTooLarge as e:
+            return _too_large(e)
+        logger.debug("image parsed", extra={"bytes": len(raw), "include_garnish": include_garnish})
+        payload = await _analyze_one(raw, include_garnish, digest)
+        if _want_timings(request):
+            payload["timings"] = metrics.snapshot()
+        if _overloaded(payload):
+            return _json_response(payload, status_code=503, headers={"Retry-After": "1"})
+        return _json_response(payload, status_code=200)
+
+    except Exception as e:
+        payload["error"] = f"fatal:{type(e).__name__}"
+        logger.exception("analyze_image failed")
+        return JSONResponse(payload, status_code=200)
+    finally:
+        metrics.end_request(timing_token)
 
-        # 1) 視覺辨識（同步呼叫）
+
+# ===== SSE 串流 =====
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+@router.post("/image/stream")
+async def analyze_image_stream(request: Request):
+    """
+    /analyze/image 的 Server-Sent Events 版本，依階段送出：
+    accepted → preprocessed → vision_item（模型邊產生邊送，暫定）→ vision（最終清單）
+    → item（逐項營養）→ totals → done。快取命中時略過 preprocessed / vision_item；
+    vision_reset 表示主模型失敗改用備援，先前的 vision_item 作廢。
+    """
+    try:
+        raw, include_garnish, digest = await _parse_image(request)
+    except UploadTooLarge as e:
+        return _too_large(e)
+
+    queue: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue()
+
+    async def emit(event: str, data: Dict[str, Any]) -> None:
+        await queue.put((event, data))
+
+    want_timings = _want_timings(request)
+
+    async def run(raw: bytes) -> None:
+        payload = _empty_payload()
+        metrics.start_request()  # 這個 task 自己的 context，不必 reset
         try:
-            result = vision_analyze_base64(image_b64)  # returns dict: {items, model, error}
-            print(f"[DEBUG] Vision model: {result.get('model')}, error: {result.get('error')}")
-            print(f"[DEBUG] Vision items: {result.get('items')}")
-            detected_items = result.get("items") or []
-            if result.get("error"):
-                payload["error"] = f"vision_error:{result.get('error')}"
+            await emit("accepted", {"bytes": len(raw), "include_garnish": include_garnish})
+            if not raw:
+                payload["error"] = "no_image"
+                return
+            detected_items = await _vision_items(raw, include_garnish, digest, payload, emit)
+            del raw
+            await emit("vision", {
+                "items": detected_items,
+                "model": payload["meta"].get("model"),
+                "cache": payload["meta"].get("cache"),
+                "error": payload["error"],
+            })
+            try:
+                with metrics.timed("nutrition"):
+                    enriched, totals = await _calc(detected_items, include_garnish)
+            except Exception as e:
+                payload["error"] = f"nutrition_error:{type(e).__name__}"
+                logger.exception("nutrition failed")
+                return
+            for i, item in enumerate(enriched):
+                await emit("item", {"index": i, **item})
+            await emit("totals", totals)
         except Exception as e:
-            detected_items = []
-            payload["error"] = f"vision_error:{type(e).__name__}"
-            print(f"[ERROR] vision failed: {type(e).__name__}: {e}")
+            payload["error"] = f"fatal:{type(e).__name__}"
+            logger.exception("analyze_image_stream failed")
+        finally:
+            done: Dict[str, Any] = {"error": payload["error"], "meta": payload["meta"]}
+            if want_timings:
+                done["timings"] = metrics.snapshot()
+            await emit("done", done)
+            await queue.put(None)
 
-        # 2) 營養計算
+    async def events():
+        task = asyncio.create_task(run(raw))
         try:
-            enriched, totals = nutrition.calc(
-                detected_items, include_garnish=include_garnish
-            )
-            payload["items"] = enriched
-            payload["totals"] = totals
-            print(f"[DEBUG] Nutrition totals: {totals}")
-            return JSONResponse(payload, status_code=200)
+            while True:
+                ev = await queue.get()
+                if ev is None:
+                    break
+                yield _sse(*ev)
+        finally:
+            # 用戶端中途斷線時，不再繼續等模型
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        except Exception as e:
-            payload["error"] = f"nutrition_error:{type(e).__name__}"
-            print(f"[ERROR] nutrition failed: {type(e).__name__}: {e}")
-            return JSONResponse(payload, status_code=200)
 
+# ===== 批次分析 =====
+
+def _batch_inputs(upload: Upload, ct: str) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    把批次上傳整理成 [{"id", "load": () -> (bytes, digest), "include_garnish"}]。
+    multipart：所有檔案 part（依上傳順序）；JSON：{"images": [base64 | {image_base64, id, include_garnish}]}。
+    圖片位元組延後到真正處理時才讀，避免一次把整批放進記憶體。
+    """
+    entries: List[Dict[str, Any]] = []
+    include_garnish = False
+
+    if "multipart/form-data" in ct:
+        ig_val = upload.fields.get("include_garnish") or upload.fields.get("includeGarnish")
+        if ig_val is not None:
+            include_garnish = _truthy(ig_val)
+        for part in upload.files:
+            entries.append({
+                "id": part.filename or part.name,
+                "load": lambda part=part: (part.read(), part.sha256()),
+                "include_garnish": include_garnish,
+            })
+        return entries, include_garnish
+
+    if upload.body is None:
+        return entries, include_garnish
+    raw = upload.body.read()
+    upload.body.close()  # 解析完只留下字串，原始 body 先釋放
+    data = json.loads(raw or b"null")
+    del raw
+    if not isinstance(data, dict):
+        return entries, include_garnish
+    include_garnish = _truthy(data.get("include_garnish") or data.get("includeGarnish") or False)
+    for i, img in enumerate(data.get("images") or []):
+        if isinstance(img, dict):
+            b64 = img.get("image_base64") or img.get("imageBase64") or img.get("image_b64") or ""
+            ig = img.get("include_garnish", img.get("includeGarnish", include_garnish))
+            entries.append({
+                "id": img.get("id", i),
+                "load": lambda b64=b64: (_b64_to_bytes(b64), None),
+                "include_garnish": _truthy(ig),
+            })
+        else:
+            entries.append({
+                "id": i,
+                "load": lambda b64=img: (_b64_to_bytes(b64), None),
+                "include_garnish": include_garnish,
+            })
+    return entries, include_garnish
+
+
+@router.post("/batch")
+async def analyze_batch(request: Request) -> JSONResponse:
+    """
+    一次分析多張圖：以 BATCH_CONCURRENCY 限制同時進行的視覺呼叫，
+    每張各自回報結果與錯誤，另附全部成功項目的合計。
+    """
+    ct = (request.headers.get("content-type") or "").lower()
+    summary: Dict[str, Any] = {
+        "results": [],
+        "totals": {"kcal": 0.0, "protein_g": 0.0, "fat_g": 0.0, "carb_g": 0.0},
+        "count": 0,
+        "failed": 0,
+        "error": None,
+    }
+
+    max_bytes = BATCH_MAX_UPLOAD_BYTES if "multipart/form-data" in ct else BATCH_MAX_JSON_BYTES
+    try:
+        upload = await read_upload(request, max_bytes=max_bytes, max_files=BATCH_MAX_IMAGES)
+    except UploadTooLarge as e:
+        return _too_large(e)
+    except TooManyFiles:
+        summary["error"] = "too_many_images"
+        summary["meta"] = {"max_images": BATCH_MAX_IMAGES}
+        return JSONResponse(summary, status_code=413)
     except Exception as e:
-        payload["error"] = f"fatal:{type(e).__name__}"
-        print(f"[FATAL] analyze_image: {type(e).__name__}: {e}")
-        return JSONResponse(payload, status_code=200)
+        summary["error"] = f"bad_request:{type(e).__name__}"
+        logger.warning("batch body read failed", extra={"error": f"{type(e).__name__}: {e}"})
+        return JSONResponse(summary, status_code=400)
+
+    try:
+        try:
+            entries, _ = _batch_inputs(upload, ct)
+        except Exception as e:
+            summary["error"] = f"bad_request:{type(e).__name__}"
+            return JSONResponse(summary, status_code=400)
+        if not entries:
+            summary["error"] = "no_image"
+            return JSONResponse(summary, status_code=200)
+        if len(entries) > BATCH_MAX_IMAGES:
+            summary["error"] = "too_many_images"
+            summary["meta"] = {"max_images": BATCH_MAX_IMAGES}
+            return JSONResponse(summary, status_code=413)
+
+        sem = asyncio.Semaphore(BATCH_CONCURRENCY)
+        want_timings = _want_timings(request)
+
+        async def run(i: int, entry: Dict[str, Any]) -> Dict[str, Any]:
+            # 批次匯入的上游呼叫排在互動式單張之後
+            admission.priority.set(admission.BATCH)
+            metrics.start_request()  # 每張圖各自的 timings（gather 為每個 run 建立獨立 context）
+            async with sem:
+                try:
+                    raw, digest = entry["load"]()
+                    result = await _analyze_one(raw, entry["include_garnish"], digest)
+                except Exception as e:
+                    result = _empty_payload()
+                    result["error"] = f"fatal:{type(e).__name__}"
+                    logger.exception("batch item failed", extra={"index": i})
+            if want_timings:
+                result["timings"] = metrics.snapshot()
+            return {"index": i, "id": entry["id"], **result}
+
+        results = await asyncio.gather(*(run(i, e) for i, e in enumerate(entries)))
+    finally:
+        upload.close()
+
+    totals = summary["totals"]
+    for r in results:
+        if r.get("error"):
+            summary["failed"] += 1
+            continue
+        for k in totals:
+            totals[k] += float(r["totals"].get(k) or 0.0)
+    summary["totals"] = {k: round(v, 1) for k, v in totals.items()}
+    summary["results"] = results
+    summary["count"] = len(results)
+    logger.info("batch done", extra={"count": summary["count"], "failed": summary["failed"]})
+    return _json_response(summary, status_code=200)
@@ -0,0 +1,246 @@
+# backend/app/services/admission.py
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.services.latency import LatencyWindow
+
+# ===== 可調參數 =====
+VISION_MAX_IN_FLIGHT = int(os.getenv("VISION_MAX_IN_FLIGHT", "32"))    # 同時送往 OpenAI 的呼叫數上限
+VISION_TPM = int(os.getenv("VISION_TPM", "0"))                          # 每分鐘 token 預算；0 表示不限
+VISION_QUEUE_SIZE = int(os.getenv("VISION_QUEUE_SIZE", "256"))          # 等待佇列上限
+# 每次呼叫除了圖片以外的 token（system/user prompt + 預期輸出）
+VISION_TOKENS_OVERHEAD = int(os.getenv("VISION_TOKENS_OVERHEAD", "700"))
+
+INTERACTIVE = 0  # 單張照片（使用者在等）
+BATCH = 1        # 批次匯入
+
+# 由呼叫端（router）設定，一路帶到實際的模型呼叫
+priority: ContextVar[int] = ContextVar("vision_priority", default=INTERACTIVE)
+# 這次辨識的總時限（event loop 時間）；排隊等待預估會超過就提早拒絕
+deadline: ContextVar[Optional[float]] = ContextVar("vision_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """排隊已滿或等不到時限內：不送出請求，直接回 overloaded:<reason>。"""
+
+    def __init__(self, reason: str):
+        self.code = f"overloaded:{reason}"
+        super().__init__(self.code)
+
+
+def estimate_tokens(width: int, height: int, detail: Optional[str]) -> int:
+    """
+    依 OpenAI 視覺計價規則估計一次呼叫的 token：
+    low 固定 85；high/auto 先縮進 2048 見方、短邊縮到 768，每個 512px tile 170，再加 85。
+    """
+    if detail == "low":
+        image_tokens = 85
+    else:
+        w, h = (width, height) if width and height else (1024, 1024)
+        scale = min(1.0, 2048 / max(w, h))
+        w, h = w * scale, h * scale
+        scale = min(1.0, 768 / min(w, h))
+        w, h = w * scale, h * scale
+        image_tokens = 85 + 170 * math.ceil(w / 512) * math.ceil(h / 512)
+    return image_tokens + VISION_TOKENS_OVERHEAD
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    tokens: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    """
+    上游呼叫的入場控制：同時進行數上限 + 每分鐘 token 的 token bucket。
+    放不進去的請求依優先序（INTERACTIVE 先於 BATCH）在有上限的佇列等待；
+    佇列滿時高優先序的請求擠掉最晚進來的低優先序請求，沒得擠、或預估等待會超過時限時，
+    立即丟 Overloaded，不等到逾時。
+    """
+
+    def __init__(self, max_in_flight: int, tpm: int, queue_size: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.capacity = float(tpm) if tpm > 0 else 0.0
+        self.rate = self.capacity / 60.0            # tokens / 秒；0 表示不限
+        self.queue_size = queue_size
+        self._level = self.capacity
+        self._stamp = time.monotonic()
+        self._in_flight = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._hold = LatencyWindow(maxlen=100)      # 每次呼叫佔用的時間
+        self.admitted = 0
+        self.queued = 0
+        self.shed: Dict[str, int] = {}
+
+    # --- token bucket ---
+    def _refill(self) -> None:
+        if not self.rate:
+            return
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def _cost(self, tokens: int) -> float:
+        # 單次超過整個預算的呼叫也要能通過（等 bucket 滿就放行）
+        return min(float(tokens), self.capacity)
+
+    def _can_run(self, tokens: int) -> bool:
+        if self._in_flight >= self.max_in_flight:
+            return False
+        return not self.rate or self._level >= self._cost(tokens)
+
+    def _take(self, tokens: int) -> None:
+        self._in_flight += 1
+        if self.rate:
+            self._level -= self._cost(tokens)
+        self.admitted += 1
+
+    def _waiting(self) -> List[_Waiter]:
+        return [w for w in self._queue if not w.future.done()]
+
+    def _shed(self, reason: str) -> Overloaded:
+        self.shed[reason] = self.shed.get(reason, 0) + 1
+        return Overloaded(reason)
+
+    def _typical_hold(self) -> float:
+        # 一次上游呼叫通常佔用多久（還沒有樣本時為 0，不做預估拒絕）
+        return self._hold.quantile(0.5) or 0.0
+
+    def _estimate_wait(self, tokens: int, prio: int) -> tuple:
+        """預估排到的等待秒數：(等空位, 等 token)。"""
+        ahead = [w for w in self._waiting() if w.priority <= prio]
+        slot_wait = 0.0
+        busy = self._in_flight + len(ahead)
+        hold = self._typical_hold()
+        if busy >= self.max_in_flight:
+            slot_wait = (busy - self.max_in_flight) // self.max_in_flight * hold + hold
+        token_wait = 0.0
+        if self.rate:
+            need = sum(self._cost(w.tokens) for w in ahead) + self._cost(tokens) - self._level
+            token_wait = max(0.0, need) / self.rate
+        return slot_wait, token_wait
+
+    # --- 排隊與放行 ---
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._refill()
+        while self._queue:
+            w = self._queue[0]
+            if w.future.done():          # 已逾時或呼叫端取消
+                heapq.heappop(self._queue)
+                continue
+            if not self._can_run(w.tokens):
+                break
+            heapq.heappop(self._queue)
+            self._take(w.tokens)
+            w.future.set_result(None)
+        # 隊首只差 token 時，排定 bucket 補足的時間再檢查
+        if self._queue and self.rate and self._in_flight < self.max_in_flight and self._timer is None:
+            head = self._queue[0]
+            delay = max(0.0, (self._cost(head.tokens) - self._level) / self.rate)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, tokens: int, prio: int = INTERACTIVE, until: Optional[float] = None) -> None:
+        self._refill()
+        if not self._waiting() and self._can_run(tokens):
+            self._take(tokens)
+            return
+        if len(self._waiting()) >= self.queue_size and not self._evict_lower(prio):
+            raise self._shed("queue_full")
+
+        loop = asyncio.get_running_loop()
+        if until is not None:
+            # 排到之後還要跑完一次呼叫，才算趕得上時限
+            until -= self._typical_hold()
+            slot_wait, token_wait = self._estimate_wait(tokens, prio)
+            if loop.time() + max(slot_wait, token_wait) > until:
+                raise self._shed("tpm" if token_wait > slot_wait else "deadline")
+
+        fut: asyncio.Future = loop.create_future()
+        heapq.heappush(self._queue, _Waiter(prio, next(self._seq), tokens, fut))
+        self.queued += 1
+        expire = None
+        if until is not None:
+            expire = loop.call_at(until, self._expire, fut)
+        self._dispatch()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            # 已經被放行但呼叫端剛好取消：歸還名額
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self.release(0.0)
+            raise
+        finally:
+            if expire is not None:
+                expire.cancel()
+
+    def _evict_lower(self, prio: int) -> bool:
+        """佇列滿時讓位：拒絕優先序較低者中最晚進來的一個；沒有可讓的就回 False。"""
+        lower = [w for w in self._waiting() if w.priority > prio]
+        if not lower:
+            return False
+        victim = max(lower, key=lambda w: (w.priority, w.seq))
+        victim.future.set_exception(self._shed("queue_full"))
+        return True
+
+    def _expire(self, fut: asyncio.Future) -> None:
+        # 排到時限仍未放行：拒絕並讓後面的人遞補
+        if not fut.done():
+            fut.set_exception(self._shed("deadline"))
+            self._dispatch()
+
+    def release(self, seconds: float) -> None:
+        self._in_flight -= 1
+        if seconds:
+            self._hold.add(seconds)
+        if self._queue:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int) -> AsyncIterator[None]:
+        """以目前 context 的 priority / deadline 取得一個上游呼叫名額。"""
+        await self.acquire(tokens, priority.get(), deadline.get())
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        self._refill()
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": len(self._waiting()),
+            "queue_size": self.queue_size,
+            "tpm": int(self.capacity),
+            "tokens_available": int(self._level) if self.rate else None,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "hold": self._hold.stats(),
+        }
+
+
+limiter = AdmissionController(
+    max_in_flight=VISION_MAX_IN_FLIGHT,
+    tpm=VISION_TPM,
+    queue_size=VISION_QUEUE_SIZE,
+)
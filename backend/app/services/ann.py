@@ -0,0 +1,202 @@
+# backend/app/services/ann.py
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# 有裝才用（pip install hnswlib / faiss-cpu）；沒裝時 hnsw / faiss 後端不可用，auto 會退回 ivf
+try:
+    import hnswlib  # type: ignore
+except Exception:
+    hnswlib = None
+try:
+    import faiss  # type: ignore
+except Exception:
+    faiss = None
+
+# ===== 可調參數 =====
+SEMANTIC_ANN_BACKEND = os.getenv("SEMANTIC_ANN_BACKEND", "exact").lower()   # exact | ivf | hnsw | faiss | auto
+SEMANTIC_ANN_MIN_SIZE = int(os.getenv("SEMANTIC_ANN_MIN_SIZE", "5000"))      # 向量數少於此值一律暴力搜尋
+SEMANTIC_ANN_NLIST = int(os.getenv("SEMANTIC_ANN_NLIST", "0"))              # IVF 分群數；0 為 ≈ 4·sqrt(n)
+SEMANTIC_ANN_NPROBE = int(os.getenv("SEMANTIC_ANN_NPROBE", "8"))            # IVF 每次查詢掃描的群數（越大越準越慢）
+SEMANTIC_ANN_M = int(os.getenv("SEMANTIC_ANN_M", "16"))                     # HNSW 每個節點的鄰居數
+SEMANTIC_ANN_EF_CONSTRUCTION = int(os.getenv("SEMANTIC_ANN_EF_CONSTRUCTION", "200"))
+SEMANTIC_ANN_EF = int(os.getenv("SEMANTIC_ANN_EF", "64"))                   # HNSW 查詢時的候選數（越大越準越慢）
+
+BACKENDS = ("exact", "ivf", "hnsw", "faiss")
+
+
+def top_k(scores, k: int) -> Tuple[Any, Any]:
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top, scores[top]
+
+
+class ExactIndex:
+    """暴力 cosine（矩陣×向量）；向量須已正規化。"""
+
+    name = "exact"
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def search(self, q, k: int = 5) -> Tuple[Any, Any]:
+        return top_k(self.matrix @ q, k)
+
+    def params(self) -> Dict[str, Any]:
+        return {}
+
+
+def _kmeans(x, nlist: int, iters: int, rng) -> Any:
+    """球面 k-means（cosine）；取樣訓練，回傳正規化後的質心。"""
+    sample = x[rng.choice(len(x), size=min(len(x), nlist * 64), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        # 空群重新挑一個樣本當質心
+        sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms == 0, 1.0, norms)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    純 NumPy 的 inverted file：k-means 把向量分成 nlist 群，同群向量連續存放；
+    查詢時只掃描與查詢最接近的 nprobe 群。nprobe = nlist 即等於暴力搜尋。
+    """
+
+    name = "ivf"
+
+    def __init__(self, matrix, nlist: int = 0, nprobe: int = SEMANTIC_ANN_NPROBE, iters: int = 10, seed: int = 0):
+        n = len(matrix)
+        self.nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        self.nprobe = max(1, min(self.nlist, nprobe))
+        rng = np.random.default_rng(seed)
+        x = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.centroids = _kmeans(x, self.nlist, iters, rng)
+        assign = np.argmax(x @ self.centroids.T, axis=1) if n else np.empty(0, dtype=np.intp)
+        order = np.argsort(assign, kind="stable")
+        self.ids = order                                   # 排序後位置 -> 原始索引
+        self.vectors = x[order]
+        counts = np.bincount(assign, minlength=self.nlist)
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, q, k: int = 5, nprobe: Optional[int] = None) -> Tuple[Any, Any]:
+        nprobe = max(1, min(self.nlist, nprobe or self.nprobe))
+        probe = np.argpartition(-(self.centroids @ q), nprobe - 1)[:nprobe]
+        spans = [(self.offsets[c], self.offsets[c + 1]) for c in probe if self.offsets[c + 1] > self.offsets[c]]
+        if not spans:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        # 同群向量連續存放：逐群對切片做矩陣×向量，不必先複製候選向量
+        rows = np.concatenate([np.arange(a, b) for a, b in spans])
+        scores = np.concatenate([self.vectors[a:b] @ q for a, b in spans])
+        top, top_scores = top_k(scores, k)
+        return self.ids[rows[top]], top_scores
+
+    def params(self) -> Dict[str, Any]:
+        return {"nlist": self.nlist, "nprobe": self.nprobe}
+
+
+class HnswIndex:
+    """hnswlib 的 HNSW 圖（inner product 空間；向量已正規化即為 cosine）。"""
+
+    name = "hnsw"
+
+    def __init__(self, matrix, m: int = SEMANTIC_ANN_M, ef_construction: int = SEMANTIC_ANN_EF_CONSTRUCTION,
+                 ef: int = SEMANTIC_ANN_EF, threads: int = -1):
+        if hnswlib is None:
+            raise RuntimeError("hnswlib is not installed")
+        x = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._index = hnswlib.Index(space="ip", dim=x.shape[1])
+        self._index.init_index(max_elements=max(1, len(x)), M=m, ef_construction=ef_construction)
+        if len(x):
+            self._index.add_items(x, np.arange(len(x)), num_threads=threads)
+        self.m, self.ef_construction = m, ef_construction
+        self.ef = ef
+        self._index.set_ef(ef)
+
+    def __len__(self) -> int:
+        return self._index.get_current_count()
+
+    def search(self, q, k: int = 5, ef: Optional[int] = None) -> Tuple[Any, Any]:
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        if ef is not None and ef != self.ef:
+            self.ef = ef
+            self._index.set_ef(ef)
+        labels, dist = self._index.knn_query(q.reshape(1, -1), k=k, num_threads=1)
+        return labels[0].astype(np.intp), (1.0 - dist[0]).astype(np.float32)  # ip 空間的距離為 1 - 內積
+
+    def params(self) -> Dict[str, Any]:
+        return {"M": self.m, "ef_construction": self.ef_construction, "ef": self.ef}
+
+
+class FaissIndex:
+    """faiss 的 HNSW（inner product）。"""
+
+    name = "faiss"
+
+    def __init__(self, matrix, m: int = SEMANTIC_ANN_M, ef_construction: int = SEMANTIC_ANN_EF_CONSTRUCTION,
+                 ef: int = SEMANTIC_ANN_EF):
+        if faiss is None:
+            raise RuntimeError("faiss is not installed")
+        x = np.ascontiguousarray(matrix, dtype=np.float32)
+        self._index = faiss.IndexHNSWFlat(x.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+        self._index.hnsw.efConstruction = ef_construction
+        self._index.add(x)
+        self.m, self.ef_construction = m, ef_construction
+        self.ef = ef
+        self._index.hnsw.efSearch = ef
+
+    def __len__(self) -> int:
+        return self._index.ntotal
+
+    def search(self, q, k: int = 5, ef: Optional[int] = None) -> Tuple[Any, Any]:
+        if ef is not None:
+            self.ef = ef
+            self._index.hnsw.efSearch = ef
+        scores, labels = self._index.search(q.reshape(1, -1).astype(np.float32), min(k, len(self)))
+        keep = labels[0] >= 0
+        return labels[0][keep].astype(np.intp), scores[0][keep]
+
+    def params(self) -> Dict[str, Any]:
+        return {"M": self.m, "ef_construction": self.ef_construction, "ef": self.ef}
+
+
+def available() -> Dict[str, bool]:
+    return {"exact": True, "ivf": True, "hnsw": hnswlib is not None, "faiss": faiss is not None}
+
+
+def build(matrix, backend: str = SEMANTIC_ANN_BACKEND, min_size: int = SEMANTIC_ANN_MIN_SIZE, **params: Any):
+    """
+    依 backend 建索引；auto 依序選 hnsw → faiss → ivf。
+    向量數少於 min_size 時一律用 exact（小表暴力搜尋就夠快，也沒有召回損失）。
+    """
+    backend = (backend or "exact").lower()
+    if backend == "exact" or len(matrix) < min_size:
+        return ExactIndex(matrix)
+    if backend == "auto":
+        backend = "hnsw" if hnswlib is not None else "faiss" if faiss is not None else "ivf"
+    if backend == "ivf":
+        return IVFIndex(matrix, nlist=params.get("nlist", SEMANTIC_ANN_NLIST), nprobe=params.get("nprobe", SEMANTIC_ANN_NPROBE))
+    if backend == "hnsw":
+        return HnswIndex(matrix, **{k: v for k, v in params.items() if k in ("m", "ef_construction", "ef")})
+    if backend == "faiss":
+        return FaissIndex(matrix, **{k: v for k, v in params.items() if k in ("m", "ef_construction", "ef")})
+    raise ValueError(f"unknown ANN backend {backend!r}; expected one of {BACKENDS + ('auto',)}")
@@ -0,0 +1,158 @@
+# backend/app/services/breaker.py
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Tuple
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """斷路器開啟中，呼叫直接被拒絕（不送出請求）。"""
+
+    def __init__(self, name: str):
+        super().__init__(f"circuit open for {name}")
+        self.name = name
+
+
+class CircuitBreaker:
+    """
+    以最近 window 次呼叫計算錯誤率與慢呼叫比例的斷路器：
+    - closed：正常放行；樣本數達 min_calls 且錯誤率或慢呼叫率超過門檻 → open
+    - open：直接拒絕，open_seconds 後轉 half_open
+    - half_open：只放行 half_open_calls 個試探呼叫；成功 → closed，失敗 → 再次 open
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_s: float = 20.0,
+        slow_rate: float = 0.8,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 1,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_s = slow_call_s
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        # (成功與否, 是否為慢呼叫)
+        self._calls: Deque[Tuple[bool, bool]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self.opened = 0      # 開啟次數
+        self.rejected = 0    # 被直接拒絕的呼叫數
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.opened += 1
+
+    def allow(self) -> bool:
+        """是否放行這次呼叫；放行後必須以 record_success / record_failure / release 結束。"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpen(self.name)
+
+    def reject_if_open(self) -> None:
+        """不佔試探名額的預先檢查（排隊前用）：確定會被拒絕時直接丟 CircuitOpen。"""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == OPEN or (self._state == HALF_OPEN and self._probes >= self.half_open_calls):
+                self.rejected += 1
+                raise CircuitOpen(self.name)
+
+    def record_success(self, seconds: float) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._calls.clear()
+                return
+            self._calls.append((True, seconds >= self.slow_call_s))
+            self._evaluate()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._calls.append((False, False))
+            self._evaluate()
+
+    def release(self) -> None:
+        """呼叫不計入統計（例如請求本身有誤），只歸還試探名額。"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_cancelled(self, seconds: float) -> None:
+        """
+        呼叫被取消（對沖輸家、總時限到）：已經超過慢呼叫門檻的算一次慢呼叫
+        （half_open 時視為試探失敗），否則不計入統計。
+        """
+        if seconds < self.slow_call_s:
+            self.release()
+            return
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._open()
+                return
+            self._calls.append((True, True))
+            self._evaluate()
+
+    def _evaluate(self) -> None:
+        n = len(self._calls)
+        if self._state != CLOSED or n < self.min_calls:
+            return
+        failures = sum(1 for ok, _ in self._calls if not ok)
+        slow = sum(1 for _, is_slow in self._calls if is_slow)
+        if failures / n >= self.failure_rate or slow / n >= self.slow_rate:
+            self._open()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._maybe_half_open()
+            n = len(self._calls)
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            slow = sum(1 for _, is_slow in self._calls if is_slow)
+            return {
+                "state": self._state,
+                "window_calls": n,
+                "failure_rate": round(failures / n, 3) if n else 0.0,
+                "slow_rate": round(slow / n, 3) if n else 0.0,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
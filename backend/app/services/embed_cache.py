@@ -0,0 +1,88 @@
+# backend/app/services/embed_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Sequence
+
+# ===== 可調參數 =====
+# 建索引用的 embeddings 快取（SQLite）；空字串表示不用快取，每次全部重新嵌入
+EMBED_CACHE_PATH = os.getenv(
+    "EMBED_CACHE_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "embed_cache.sqlite")),
+)
+
+
+def make_key(model: str, text: str) -> str:
+    """內容定址：sha256(model + 標籤文字)。換模型或改標籤都會是新的 key。"""
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    標籤 embeddings 的磁碟快取：key -> float32 向量（BLOB）。
+    只增不改：同一個 key 的向量不會變，重建索引時只需嵌入查不到的標籤。
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """回傳查得到的 {key: 向量}；查不到的 key 不出現在結果中。"""
+        out: Dict[str, List[float]] = {}
+        uniq = list(dict.fromkeys(keys))
+        with self._lock:
+            # SQLite 預設最多 999 個參數，分段查
+            for i in range(0, len(uniq), 500):
+                chunk = uniq[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    out[key] = array("f", blob).tolist()
+        return out
+
+    def put_many(self, model: str, pairs: Iterable[tuple]) -> int:
+        """寫入 [(key, 向量)]；一批一個 transaction，中斷時已寫入的批次仍保留。"""
+        now = time.time()
+        rows = [(key, model, len(vec), array("f", vec).tobytes(), now) for key, vec in pairs]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """刪掉不在 keep 裡的向量（標籤已從 ontology 移除或改了文字）；回傳刪除筆數。"""
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (key TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM keep_keys")
+            self._conn.executemany("INSERT OR IGNORE INTO keep_keys (key) VALUES (?)", ((k,) for k in keep))
+            cur = self._conn.execute("DELETE FROM embeddings WHERE key NOT IN (SELECT key FROM keep_keys)")
+            self._conn.execute("DELETE FROM keep_keys")
+            self._conn.commit()
+            return cur.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,94 @@
+# backend/app/services/fuzzy_match.py
+from __future__ import annotations
+
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 左右補上邊界字元，讓 2~3 字的中文名稱也能產生足夠的 n-gram
+_PAD_L = "\x02"
+_PAD_R = "\x03"
+
+
+def _grams(s: str) -> set:
+    """
+    字元 trigram（含邊界）；另外補上 bigram，
+    否則「雞蛋」vs「雞鐵蛋」這類短中文名稱一個 trigram 都不會重疊。
+    """
+    p = f"{_PAD_L}{s}{_PAD_R}"
+    out = {p[i:i + 3] for i in range(len(p) - 2)}
+    out.update(p[i:i + 2] for i in range(len(p) - 1))
+    return out
+
+
+class TrigramMatcher:
+    """
+    載入時建一次的模糊比對器：n-gram 倒排索引挑出候選，
+    只對候選清單跑 SequenceMatcher；評分與 cutoff 規則同 difflib.get_close_matches(n=1)。
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]], shortlist: int = 64):
+        self.shortlist = shortlist
+        self._keys: List[str] = []
+        self._payloads: List[Any] = []
+        self._gram_count: List[int] = []
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+        seen: set = set()
+        for key, payload in entries:
+            # 同一個鍵只保留第一個（與原本「找到第一個同名候選」一致）
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            idx = len(self._keys)
+            self._keys.append(key)
+            self._payloads.append(payload)
+            grams = _grams(key)
+            self._gram_count.append(len(grams))
+            for g in grams:
+                self._postings[g].append(idx)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _candidates(self, key: str, cutoff: float) -> List[int]:
+        q = _grams(key)
+        shared: Dict[int, int] = defaultdict(int)
+        for g in q:
+            for idx in self._postings.get(g, ()):
+                shared[idx] += 1
+        if not shared:
+            return []
+
+        la = len(key)
+        scored: List[Tuple[float, int]] = []
+        for idx, n in shared.items():
+            lb = len(self._keys[idx])
+            # 長度差太大時 ratio 的上限就已低於 cutoff
+            if 2.0 * min(la, lb) / (la + lb) < cutoff:
+                continue
+            scored.append((2.0 * n / (len(q) + self._gram_count[idx]), idx))
+        scored.sort(reverse=True)
+        return [idx for _, idx in scored[: self.shortlist]]
+
+    def best(self, key: str, cutoff: float) -> Optional[Tuple[str, Any]]:
+        """回傳 (命中鍵, payload)；沒有達到 cutoff 的候選則回傳 None。"""
+        if not key:
+            return None
+        s = SequenceMatcher()
+        s.set_seq2(key)
+        best: Optional[Tuple[float, str, int]] = None
+        for idx in self._candidates(key, cutoff):
+            k = self._keys[idx]
+            s.set_seq1(k)
+            if s.real_quick_ratio() >= cutoff and s.quick_ratio() >= cutoff:
+                score = s.ratio()
+                if score >= cutoff and (best is None or (score, k) > best[:2]):
+                    best = (score, k, idx)
+        if best is None:
+            return None
+        return best[1], self._payloads[best[2]]
+
+    def find(self, key: str, cutoff: float) -> Optional[Any]:
+        hit = self.best(key, cutoff)
+        return hit[1] if hit else None
@@ -0,0 +1,117 @@
+# backend/app/services/image_prep.py
+from __future__ import annotations
+
+import io
+import os
+from dataclasses import dataclass
+
+# Pillow 沒裝時直接送原圖（行為同舊版）
+try:
+    from PIL import Image, ImageOps  # type: ignore
+except Exception:
+    Image = None
+    ImageOps = None
+
+# ===== 可調參數 =====
+VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1024"))            # 長邊上限（px）
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower()  # jpeg | webp
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+VISION_DETAIL = os.getenv("VISION_DETAIL", "auto").lower()             # auto | low | high
+# detail=auto 時，長邊不超過此值就用 low（OpenAI low detail 固定以 512px 處理）
+VISION_LOW_DETAIL_EDGE = int(os.getenv("VISION_LOW_DETAIL_EDGE", "512"))
+
+_MIME = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png", "gif": "image/gif"}
+_EXIF_ORIENTATION = 0x0112
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime: str
+    detail: str
+    width: int = 0
+    height: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    resized: bool = False
+
+    def metrics(self) -> dict:
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "width": self.width,
+            "height": self.height,
+            "resized": self.resized,
+            "detail": self.detail,
+        }
+
+
+def _pick_detail(width: int, height: int) -> str:
+    if VISION_DETAIL in ("low", "high"):
+        return VISION_DETAIL
+    if width and height and max(width, height) <= VISION_LOW_DETAIL_EDGE:
+        return "low"
+    return "high" if width and height else "auto"
+
+
+def _sniff_mime(raw: bytes) -> str:
+    if raw[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if raw[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    if raw[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return "image/jpeg"
+
+
+def prepare(raw: bytes) -> PreparedImage:
+    """
+    送模型前的前處理：套用 EXIF 方向、長邊縮到 VISION_MAX_EDGE、
+    重新壓成 JPEG/WebP，並依尺寸決定 image_url 的 detail。
+    圖本來就夠小、格式相同且不需轉向時沿用原檔；解不開則原樣送出。
+    """
+    n_in = len(raw)
+    if Image is None:
+        return PreparedImage(raw, _sniff_mime(raw), _pick_detail(0, 0), bytes_in=n_in, bytes_out=n_in)
+
+    fmt = "webp" if VISION_IMAGE_FORMAT == "webp" else "jpeg"
+    try:
+        with Image.open(io.BytesIO(raw)) as im:
+            src_fmt = (im.format or "").lower()
+            w0, h0 = im.size
+            orientation = im.getexif().get(_EXIF_ORIENTATION, 1)
+            needs_resize = max(w0, h0) > VISION_MAX_EDGE
+
+            if not needs_resize and orientation in (0, 1) and src_fmt == fmt:
+                return PreparedImage(
+                    raw, _MIME[fmt], _pick_detail(w0, h0),
+                    width=w0, height=h0, bytes_in=n_in, bytes_out=n_in,
+                )
+
+            # JPEG 可先以較小解析度解碼（只會縮到不小於目標尺寸）
+            im.draft("RGB", (VISION_MAX_EDGE, VISION_MAX_EDGE))
+            img = ImageOps.exif_transpose(im)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            if max(img.size) > VISION_MAX_EDGE:
+                img.thumbnail((VISION_MAX_EDGE, VISION_MAX_EDGE), Image.LANCZOS)
+
+            buf = io.BytesIO()
+            img.save(buf, format=fmt.upper(), quality=VISION_IMAGE_QUALITY, optimize=True)
+            w, h = img.size
+    except Exception:
+        return PreparedImage(raw, _sniff_mime(raw), _pick_detail(0, 0), bytes_in=n_in, bytes_out=n_in)
+
+    data = buf.getvalue()
+    # 沒縮圖也沒轉向、重壓反而更大時，沿用原檔
+    if not needs_resize and orientation in (0, 1) and len(data) >= n_in:
+        return PreparedImage(
+            raw, _sniff_mime(raw), _pick_detail(w0, h0),
+            width=w0, height=h0, bytes_in=n_in, bytes_out=n_in,
+        )
+    return PreparedImage(
+        data, _MIME[fmt], _pick_detail(w, h),
+        width=w, height=h, bytes_in=n_in, bytes_out=len(data), resized=needs_resize,
+    )
@@ -0,0 +1,38 @@
+# backend/app/services/latency.py
+from __future__ import annotations
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class LatencyWindow:
+    """最近 N 筆耗時（秒）的滑動視窗，用來估計分位數（p50/p95 等）。"""
+
+    def __init__(self, maxlen: int = 200):
+        self._samples: Deque[float] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """最近樣本的 q 分位數（nearest-rank）；沒有樣本時回 None。"""
+        with self._lock:
+            data = sorted(self._samples)
+        if not data:
+            return None
+        idx = min(len(data) - 1, max(0, int(round(q * len(data) + 0.5)) - 1))
+        return data[idx]
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        return {
+            "samples": len(self._samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
@@ -0,0 +1,137 @@
+# backend/app/services/log.py
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+# ===== 可調參數 =====
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()            # json | text
+# DEBUG 等級的大型內容（例如整份 Vision items）只抽樣記錄，避免洗版
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))      # 滿了就丟棄，不阻塞請求
+
+APP_LOGGER = "eatlyze"
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_sample_payloads: ContextVar[bool] = ContextVar("log_sample_payloads", default=False)
+
+# LogRecord 內建欄位；其餘（extra=...）當作結構化欄位輸出
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "request_id"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """一行一筆 JSON：ts / level / logger / msg / request_id + extra 欄位。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        rid = getattr(record, "request_id", None)
+        if rid:
+            out["request_id"] = rid
+        for k, v in record.__dict__.items():
+            if k not in _RESERVED and not k.startswith("_"):
+                out[k] = v
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {k: v for k, v in record.__dict__.items() if k not in _RESERVED and not k.startswith("_")}
+        return f"{line} {extra}" if extra else line
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """
+    呼叫端只做最少的事：帶上 request_id、凍結訊息字串，然後放進佇列；
+    格式化與寫 stdout 都在背景執行緒（QueueListener）完成。佇列滿時直接丟棄。
+    """
+
+    def __init__(self, q: "queue.Queue[logging.LogRecord]"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup() -> None:
+    """設定 root logger（可重複呼叫）；uvicorn 自己的 logger 不動。"""
+    global _listener
+    if _listener is not None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        stream.setFormatter(_TextFormatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    q: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    handler = _NonBlockingQueueHandler(q)
+    root = logging.getLogger()
+    root.handlers = [h for h in root.handlers if not isinstance(h, _NonBlockingQueueHandler)]
+    root.addHandler(handler)
+    # LOG_LEVEL 只套用在本服務的 logger；第三方（openai 的 DEBUG 會整包印出 base64 圖片）最多到 WARNING
+    root.setLevel(logging.WARNING)
+    logging.getLogger(APP_LOGGER).setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+
+    _listener = QueueListener(q, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """送出佇列中剩下的紀錄並停止背景執行緒。"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """本服務的 logger 一律掛在 eatlyze 之下（eatlyze.analyze …），才會套用 LOG_LEVEL。"""
+    if name != APP_LOGGER and not name.startswith(APP_LOGGER + "."):
+        name = f"{APP_LOGGER}.{name}"
+    return logging.getLogger(name)
+
+
+def new_request(rid: Optional[str] = None) -> str:
+    """進入一個請求：設定 request_id，並決定這個請求的 payload log 是否抽樣記錄。"""
+    rid = rid or uuid.uuid4().hex[:16]
+    request_id.set(rid)
+    _sample_payloads.set(random.random() < LOG_PAYLOAD_SAMPLE_RATE)
+    return rid
+
+
+def payload(logger: logging.Logger, msg: str, **fields: Any) -> None:
+    """大型 DEBUG 內容：只有 DEBUG 開啟且這個請求被抽中時才記錄。"""
+    if _sample_payloads.get() and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(msg, extra=fields)
+
@@ -0,0 +1,189 @@
+# backend/app/services/metrics.py
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 秒；涵蓋 JSON 解析（µs 級）到視覺呼叫（數十秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+# 名稱查詢（memo 命中為 µs 級，fuzzy 為 ms 級）
+LOOKUP_BUCKETS: Tuple[float, ...] = (
+    0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+)
+
+REGISTRY: List["_Metric"] = []
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if v != int(v) else f"{int(v)}.0"
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(v)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Prometheus 累積直方圖（_bucket / _sum / _count），依 label 組合各自累計。"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各 bucket 次數（非累積，最後一格為 +Inf）, sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][idx] += 1
+            s[1] += value
+            s[2] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for key, (counts, total, n) in items:
+            acc = 0
+            for bound, c in zip(self.buckets + (float("inf"),), counts):
+                acc += c
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acc}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return lines
+
+
+def render() -> str:
+    """Prometheus text exposition format（/metrics）。"""
+    lines: List[str] = []
+    for m in REGISTRY:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== 指標 =====
+REQUEST_SECONDS = Histogram(
+    "eatlyze_request_duration_seconds", "HTTP request duration.", ("route", "method", "status")
+)
+STAGE_SECONDS = Histogram(
+    "eatlyze_stage_duration_seconds", "Duration of analyze pipeline stages.", ("stage",)
+)
+VISION_CALL_SECONDS = Histogram(
+    "eatlyze_vision_call_duration_seconds", "Upstream vision model call duration.", ("model", "outcome")
+)
+NUTRITION_LOOKUP_SECONDS = Histogram(
+    "eatlyze_nutrition_lookup_duration_seconds",
+    "Food name resolution per item, by the step that matched.",
+    ("method",),
+    buckets=LOOKUP_BUCKETS,
+)
+VISION_CACHE_TOTAL = Counter(
+    "eatlyze_vision_cache_total", "Vision results by source (cache tier, coalesced or miss).", ("result",)
+)
+
+
+# ===== 單一請求的階段耗時 =====
+# 每個請求一個 dict（秒，同名階段累加）；子 task 會複製 context，仍寫回同一個 dict
+_TIMINGS: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def start_request() -> Token:
+    return _TIMINGS.set({})
+
+
+def end_request(token: Token) -> None:
+    _TIMINGS.reset(token)
+
+
+def record(key: str, seconds: float) -> None:
+    """只記到目前請求的 timings（不進直方圖）。"""
+    d = _TIMINGS.get()
+    if d is not None:
+        d[key] = d.get(key, 0.0) + seconds
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    record(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def snapshot() -> Optional[Dict[str, float]]:
+    """目前請求的各階段耗時（毫秒）；不在請求內時回 None。"""
+    d = _TIMINGS.get()
+    if d is None:
+        return None
+    return {k: round(v * 1000, 3) for k, v in d.items()}
@@ -7,6 +7,8 @@ import re
 from difflib import get_close_matches
 from typing import Dict, List, Tuple, Optional
 
+from app.services.fuzzy_match import TrigramMatcher
+
 # ---- 欄位鍵定義（相容多種表頭）----
 NAME_KEYS  = ("name", "食品名稱", "食材", "canonical_zh")
 CANON_KEYS = ("canonical", "標準名", "英文名")
@@ -144,10 +146,12 @@ def _load_food_table(csv_path: str) -> List[dict]:
         return [dict(r) for r in reader]
 
 _FOODS: List[dict] = []
+# 以 _FOODS 建好的模糊比對器（載入時建一次）
+_FUZZY: Optional[TrigramMatcher] = None
 
 def _ensure_loaded():
     """嘗試在多個常見路徑載入 foods_tw.csv"""
-    global _FOODS
+    global _FOODS, _FUZZY
     if _FOODS:
         return
     candidates = [
@@ -162,6 +166,9 @@ def _ensure_loaded():
             break
     if not _FOODS:
         raise FileNotFoundError("foods_tw.csv not found in common locations.")
+    _FUZZY = TrigramMatcher(
+        (_norm(n), r) for r in _FOODS for n in _all_names_for_row(r)
+    )
 
 def _all_names_for_row(r: dict) -> List[str]:
     """此資料列可用於比對的所有名稱（中文/英文/別名中文）"""
@@ -202,6 +209,10 @@ def _fuzzy_find(name: str, pool: Optional[List[dict]] = None, cutoff: float = 0.
     if not key:
         return None
 
+    # 全表比對走預先建好的索引；自訂 pool 才逐筆比對
+    if pool is _FOODS and _FUZZY is not None:
+        return _FUZZY.find(key, cutoff)
+
     candidates: List[Tuple[str, dict]] = []
     for r in pool:
         for n in _all_names_for_row(r):
@@ -4,9 +4,23 @@ from __future__ import annotations
 import csv
 import os
 import re
-from difflib import get_close_matches
-from typing import Dict, List, Tuple, Optional
-
+import sys
+import threading
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Optional
+
+# NumPy 沒裝時 calc_many 退回逐餐呼叫 calc，結果相同
+try:
+    import numpy as np  # type: ignore
+except Exception:
+    np = None
+
+from app.services.fuzzy_match import TrigramMatcher
+from app.services.lru import LRUCache, MISSING
+from app.services import metrics
+from app.services import semantic_match
 # 讓 analyze_and_calc 可以直接呼叫視覺分析
 from app.services.openai_client import vision_analyze_base64
 
@@ -124,43 +138,106 @@ def _alias_to_zh(name: str) -> str:
     k2 = _norm(_strip_parens(name))
     return _ALIAS_NORM.get(k2, name)
 
-def _col(row: dict, keys: Tuple[str, ...], default=None):
-    for k in keys:
-        if k in row and row[k] not in (None, ""):
-            return row[k]
-    return default
+class FoodTable:
+    """
+    欄式食物表：表頭別名（NAME_KEYS、KCAL_KEYS…）載入時解析一次，
+    數值一次轉成 float 陣列；calc() 只需用列索引取值。
+    """
+
+    __slots__ = ("names", "canons", "kcal", "protein_g", "fat_g", "carb_g", "n_csv")
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.canons: List[str] = []
+        self.kcal = array("d")
+        self.protein_g = array("d")
+        self.fat_g = array("d")
+        self.carb_g = array("d")
+        # 前 n_csv 列來自 CSV；之後是內建預設（不參與名稱比對）
+        self.n_csv = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def append(self, name: str, canon: str, kcal: float, p: float, f: float, c: float) -> int:
+        self.names.append(sys.intern(name or ""))
+        self.canons.append(sys.intern(canon or ""))
+        self.kcal.append(kcal)
+        self.protein_g.append(p)
+        self.fat_g.append(f)
+        self.carb_g.append(c)
+        return len(self.names) - 1
+
+def _header_cols(header: List[str], keys: Tuple[str, ...]) -> List[int]:
+    """依別名優先順序回傳表頭中實際存在的欄位位置。"""
+    pos = {h: i for i, h in enumerate(header)}
+    return [pos[k] for k in keys if k in pos]
+
+def _pick(cells: List[str], cols: List[int]):
+    """取第一個非空的欄位值（多個別名欄同時存在時依優先序）。"""
+    for i in cols:
+        if i < len(cells) and cells[i] not in (None, ""):
+            return cells[i]
+    return None
 
-def _load_csv(path: str) -> List[dict]:
+def _load_csv(path: str) -> FoodTable:
     """
     以 utf-8-sig 讀取以避免 BOM 造成欄名 '\ufeffname' 問題；
-    並把欄名做一次標準化，解決大小寫/空白/底線差異。
+    標頭標準化與欄位別名只解析一次，數值在載入時就轉成 float。
     """
+    table = FoodTable()
     with open(path, "r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        rows: List[dict] = []
-
+        reader = csv.reader(f)
         # 標頭正規化：去除 BOM 與空白
-        field_map = {}
-        for h in reader.fieldnames or []:
-            hh = (h or "").strip()
-            hh = hh.replace("\ufeff", "")
-            field_map[h] = hh
-
-        for r in reader:
-            nr = {}
-            for k, v in r.items():
-                nk = field_map.get(k, k)
-                nr[nk] = v
-            rows.append(nr)
-        return rows
-
-_FOODS: List[dict] = []
-
-def _ensure_loaded():
+        header = [(h or "").strip().replace("\ufeff", "") for h in next(reader, [])]
+        name_cols = _header_cols(header, NAME_KEYS)
+        canon_cols = _header_cols(header, CANON_KEYS)
+        kcal_cols = _header_cols(header, KCAL_KEYS)
+        prot_cols = _header_cols(header, PROT_KEYS)
+        fat_cols = _header_cols(header, FAT_KEYS)
+        carb_cols = _header_cols(header, CARB_KEYS)
+
+        for cells in reader:
+            if not cells:
+                continue
+            table.append(
+                _pick(cells, name_cols),
+                _pick(cells, canon_cols),
+                _num(_pick(cells, kcal_cols)),
+                _num(_pick(cells, prot_cols)),
+                _num(_pick(cells, fat_cols)),
+                _num(_pick(cells, carb_cols)),
+            )
+    table.n_csv = len(table)
+    return table
+
+@dataclass(frozen=True)
+class _FoodState:
+    """
+    一次載入的完整狀態：食物表、各索引與模糊比對器，加上載入代數。
+    建好後不再修改；查詢時每次呼叫只讀一次 _STATE，列索引、營養值與快取鍵都出自同一版。
+    """
+
+    table: FoodTable
+    # 正規化名稱 -> table 的列索引（載入時建一次，查詢為 O(1)）
+    names: Dict[str, int]
+    # 去括號後的名稱 -> 列索引（完整名稱查不到時才用）
+    stripped: Dict[str, int]
+    # 內建預設 canonical -> 列索引（附加在 CSV 列之後）
+    defaults: Dict[str, int]
+    # 模糊比對（n-gram 倒排索引）
+    fuzzy: TrigramMatcher
+    # 每次載入 +1；寫進解析快取的鍵，舊版的結果不會被新版查到
+    generation: int
+
+_STATE: Optional[_FoodState] = None
+# (generation, name, canonical) -> 解析出的列索引（含查無結果）
+_RESOLVE_MEMO = LRUCache(maxsize=int(os.getenv("NUTRITION_MEMO_SIZE", "4096")))
+# 同時只讓一個執行緒載入（warm_up 的 worker 與提早進來的請求不會各建一份）
+_LOAD_LOCK = threading.Lock()
+
+def _load_table() -> FoodTable:
     """多路徑容錯載入 foods_tw.csv"""
-    global _FOODS
-    if _FOODS:
-        return
     cands = [
         os.path.join(os.path.dirname(__file__), "..", "data", "foods_tw.csv"),
         os.path.join(os.getcwd(), "backend", "app", "data", "foods_tw.csv"),
@@ -169,14 +246,60 @@ def _ensure_loaded():
     ]
     for p in map(os.path.normpath, cands):
         if os.path.exists(p):
-            _FOODS = _load_csv(p)
-            break
-    if not _FOODS:
-        raise FileNotFoundError("foods_tw.csv not found in common locations.")
+            return _load_csv(p)
+    raise FileNotFoundError("foods_tw.csv not found in common locations.")
 
-def _names_for_row(r: dict) -> List[str]:
-    zh = (_col(r, NAME_KEYS, "") or "").strip()
-    en = (_col(r, CANON_KEYS, "") or "").strip()
+def _load_and_publish() -> None:
+    """
+    建好新的 _FoodState，再以單一次指定換上 _STATE：
+    其他執行緒看到的不是舊的完整狀態就是新的完整狀態。呼叫端須持有 _LOAD_LOCK。
+    """
+    global _STATE
+    table = _load_table()
+    defaults = _add_defaults(table)
+    names, stripped, fuzzy = _build_name_index(table)
+    generation = _STATE.generation + 1 if _STATE is not None else 1
+    _STATE = _FoodState(table, names, stripped, defaults, fuzzy, generation)
+    # 舊代數的項目已查不到，清掉只是釋放空間
+    _RESOLVE_MEMO.clear()
+
+def is_loaded() -> bool:
+    return _STATE is not None
+
+def _state() -> _FoodState:
+    """目前的載入狀態（尚未載入就先載入）。"""
+    s = _STATE
+    if s is not None:
+        return s
+    with _LOAD_LOCK:
+        if _STATE is None:
+            _load_and_publish()
+        return _STATE
+
+def reload():
+    """重新讀取 foods_tw.csv 並重建索引（解析快取一併失效）；重建期間查詢照常使用舊表。"""
+    with _LOAD_LOCK:
+        _load_and_publish()
+
+def warm_up() -> Dict[str, Any]:
+    """預先載入食物表並建好索引（供啟動時呼叫），回傳筆數與耗時。"""
+    t0 = time.perf_counter()
+    s = _state()
+    semantic = semantic_match.enabled() and semantic_match.matcher.load()
+    return {
+        "rows": s.table.n_csv,
+        "names": len(s.names),
+        "fuzzy_keys": len(s.fuzzy),
+        "semantic_labels": len(semantic_match.matcher.labels) if semantic else 0,
+        "load_ms": round((time.perf_counter() - t0) * 1000, 1),
+    }
+
+def memo_stats() -> Dict[str, int]:
+    return _RESOLVE_MEMO.stats()
+
+def _names_for_row(t: FoodTable, i: int) -> List[str]:
+    zh = t.names[i].strip()
+    en = t.canons[i].strip()
     out: List[str] = []
     if zh:
         out.append(zh)
@@ -198,44 +321,76 @@ def _names_for_row(r: dict) -> List[str]:
             dedup.append(n)
     return dedup
 
-def _fuzzy_find(name: str, cutoff: float = 0.66) -> Optional[dict]:
-    _ensure_loaded()
+def _add_defaults(t: FoodTable) -> Dict[str, int]:
+    """把內建 per-100g 預設值附加到表尾（CSV 找不到時才會用到），回傳 canonical -> 列索引。"""
+    index: Dict[str, int] = {}
+    for k, per100 in DEFAULTS_PER100.items():
+        key = _norm(k)
+        if key in index:
+            continue
+        index[key] = t.append(
+            _alias_to_zh(k), k,
+            per100["kcal"], per100["protein_g"], per100["fat_g"], per100["carb_g"],
+        )
+    return index
+
+def _build_name_index(t: FoodTable) -> Tuple[Dict[str, int], Dict[str, int], TrigramMatcher]:
+    """
+    以每列的名稱/別名建立 正規化名稱 -> 列索引；去括號版本另存一份，優先度較低。
+    同一鍵以較前面的列為準，與逐列掃描時「第一個命中」的行為一致。
+    回傳 (名稱索引, 去括號索引, 模糊比對器)。
+    """
+    index: Dict[str, int] = {}
+    stripped: Dict[str, int] = {}
+    for i in range(t.n_csv):
+        for n in _names_for_row(t, i):
+            index.setdefault(_norm(n), i)
+            k2 = _norm(_strip_parens(n))
+            if k2:
+                stripped.setdefault(k2, i)
+    fuzzy = TrigramMatcher(
+        (_norm(n), i) for i in range(t.n_csv) for n in _names_for_row(t, i)
+    )
+    return index, stripped, fuzzy
+
+def _lookup_exact(s: _FoodState, *keys: str) -> Optional[int]:
+    """多個鍵同時命中時取列索引最小者（等同原本逐列掃描的順序）。"""
+    for index in (s.names, s.stripped):
+        hits = [index[k] for k in keys if k and k in index]
+        if hits:
+            return min(hits)
+    return None
+
+def _fuzzy_find(name: str, cutoff: float = 0.66, s: Optional[_FoodState] = None) -> Optional[int]:
+    s = s or _state()
     key = _norm(name)
     if not key:
         return None
-    cand: List[Tuple[str, dict]] = []
-    for r in _FOODS:
-        for n in _names_for_row(r):
-            cand.append((_norm(n), r))
-    corpus = [c[0] for c in cand if c[0]]
-    hits = get_close_matches(key, corpus, n=1, cutoff=cutoff)
-    if hits:
-        target = hits[0]
-        for k, r in cand:
-            if k == target:
-                return r
-    return None
+    return s.fuzzy.find(key, cutoff)
 
-def _find_row(name: str) -> Optional[dict]:
-    _ensure_loaded()
+def _find_row_method(name: str, fuzzy: bool = True, s: Optional[_FoodState] = None) -> Tuple[Optional[int], str]:
+    """回傳 (s.table 的列索引, 命中的步驟 exact|alias|fuzzy)；查無則 (None, "none")。fuzzy=False 時不做模糊比對。"""
+    s = s or _state()
     if not name:
-        return None
-    key = _norm(name)
-    key2 = _norm(_strip_parens(name))
-    for r in _FOODS:
-        for n in _names_for_row(r):
-            kn = _norm(n)
-            if kn == key or kn == key2:
-                return r
+        return None, "none"
+    i = _lookup_exact(s, _norm(name), _norm(_strip_parens(name)))
+    if i is not None:
+        return i, "exact"
     # alias
     zh_alias = _alias_to_zh(name)
     if zh_alias and zh_alias != name:
-        for r in _FOODS:
-            for n in _names_for_row(r):
-                if _norm(n) == _norm(zh_alias):
-                    return r
+        i = _lookup_exact(s, _norm(zh_alias))
+        if i is not None:
+            return i, "alias"
+    if not fuzzy:
+        return None, "none"
     # fuzzy
-    return _fuzzy_find(name)
+    i = _fuzzy_find(name, s=s)
+    return (i, "fuzzy") if i is not None else (None, "none")
+
+def _find_row(name: str) -> Optional[int]:
+    """回傳目前食物表的列索引；查無則 None。"""
+    return _find_row_method(name)[0]
 
 def _coerce_items(items):
     if isinstance(items, dict):
@@ -244,34 +399,74 @@ def _coerce_items(items):
         return []
     return items
 
-def _defaults_row_for(canonical_en: str) -> Optional[dict]:
-    """若 CSV 找不到，回傳一個內建的 per-100g 資料列（與 CSV 欄位相容）。"""
+def _defaults_row_for(canonical_en: str, s: Optional[_FoodState] = None) -> Optional[int]:
+    """若 CSV 找不到，回傳內建 per-100g 預設值所在的列索引。"""
     if not canonical_en:
         return None
-    key = _norm(canonical_en)
-    for k in DEFAULTS_PER100.keys():
-        if _norm(k) == key:
-            per100 = DEFAULTS_PER100[k]
-            zh = _alias_to_zh(k)
-            return {
-                "canonical": k,
-                "英文名": k,               # 兼容可能存在的欄位
-                "name": zh,
-                "食品名稱": zh,
-                "canonical_zh": zh,
-                "kcal": per100["kcal"],
-                "protein_g": per100["protein_g"],
-                "fat_g": per100["fat_g"],
-                "carb_g": per100["carb_g"],
-            }
+    return (s or _state()).defaults.get(_norm(canonical_en))
+
+def _memo_key(s: str) -> str:
+    # 比對流程都會經過 _norm（忽略大小寫與空白），這裡只做不影響結果的收斂
+    return " ".join((s or "").lower().split())
+
+def _semantic_row(text: str, s: _FoodState) -> Optional[int]:
+    """語意比對 ontology，取第一個能對應到 CSV 列（或內建預設）的候選。"""
+    for pos, _score in semantic_match.matcher.search(text):
+        item = semantic_match.matcher.items[pos] if pos < len(semantic_match.matcher.items) else {}
+        cano = str(item.get("canonical") or "")
+        label = str(item.get("label") or "")
+        for q in (cano, label, _alias_to_zh(cano)):
+            if q:
+                i = _lookup_exact(s, _norm(q), _norm(_strip_parens(q)))
+                if i is not None:
+                    return i
+        i = _defaults_row_for(cano, s)
+        if i is not None:
+            return i
     return None
 
+def _resolve_method(nm: str, cano: str, s: Optional[_FoodState] = None) -> Tuple[Optional[int], str]:
+    """
+    name → canonical → canonical 的中文別名（精確/別名/模糊）→ 內建預設；結果（含 None）寫入 LRU。
+    啟用語意比對時，以上全部查不到才做語意比對：語意索引只涵蓋 ontology 的少數條目，
+    且 cosine 對不相干的食物也常有 0.5 以上，放在模糊比對前面會把原本對的結果換成錯的。
+    s 為呼叫端讀到的載入狀態；回傳的列索引屬於 s.table，快取鍵也用 s 的代數。
+    回傳 (列索引, 命中步驟 exact|alias|fuzzy|default|semantic|none|memo)。
+    """
+    s = s or _state()
+    key = (s.generation, _memo_key(nm), _memo_key(cano))
+    i = _RESOLVE_MEMO.get(key)
+    if i is not MISSING:
+        return i, "memo"
+    cacheable = True
+    # 先嘗試 CSV，找不到再用內建預設（列索引可能是 0，不能用 or 串接）
+    for q in (nm, cano, _alias_to_zh(cano)):
+        i, method = _find_row_method(q, s=s)
+        if i is not None:
+            break
+    else:
+        i = _defaults_row_for(cano, s)
+        method = "default" if i is not None else "none"
+    if i is None and semantic_match.enabled():
+        try:
+            i = _semantic_row(cano or nm, s)
+            method = "semantic" if i is not None else "none"
+        except semantic_match.SemanticUnavailable:
+            cacheable = False  # embeddings 暫時失敗：這次查無結果，但不記住
+    if cacheable:
+        _RESOLVE_MEMO.put(key, i)
+    return i, method
+
+def _resolve(nm: str, cano: str) -> Optional[int]:
+    return _resolve_method(nm, cano)[0]
+
 def calc(items: List[Dict], include_garnish: bool = False):
     """
     items: [{'name':..., 'canonical':..., 'weight_g':..., 'is_garnish':bool}, ...]
     return: (enriched_items, totals)
     """
-    _ensure_loaded()
+    s = _state()
+    t = s.table
     items = _coerce_items(items)
 
     enriched: List[Dict] = []
@@ -291,29 +486,26 @@ def calc(items: List[Dict], include_garnish: bool = False):
         nm = str(it.get("name") or "").strip()
         cano = str(it.get("canonical") or "").strip()
 
-        # 先嘗試 CSV，找不到再用內建預設
-        row = _find_row(nm) or _find_row(cano) or _find_row(_alias_to_zh(cano))
-        if row is None:
-            row = _defaults_row_for(cano)
+        started = time.perf_counter()
+        i, method = _resolve_method(nm, cano, s)
+        elapsed = time.perf_counter() - started
+        metrics.NUTRITION_LOOKUP_SECONDS.observe(elapsed, method=method)
+        metrics.record(f"nutrition_lookup:{method}", elapsed)
 
         w = _num(it.get("weight_g", 0.0), 0.0)
         if w < 0:
             w = 0.0
 
-        if row:
-            per100_kcal = _num(_col(row, KCAL_KEYS, 0))
-            per100_p = _num(_col(row, PROT_KEYS, 0))
-            per100_f = _num(_col(row, FAT_KEYS, 0))
-            per100_c = _num(_col(row, CARB_KEYS, 0))
+        if i is not None:
             ratio = w / 100.0
-            kcal = round(per100_kcal * ratio, 1)
-            p = round(per100_p * ratio, 1)
-            f = round(per100_f * ratio, 1)
-            c = round(per100_c * ratio, 1)
+            kcal = round(t.kcal[i] * ratio, 1)
+            p = round(t.protein_g[i] * ratio, 1)
+            f = round(t.fat_g[i] * ratio, 1)
+            c = round(t.carb_g[i] * ratio, 1)
             matched = True
 
-            label = _col(row, NAME_KEYS) or _alias_to_zh(_col(row, CANON_KEYS, "") or nm or cano)
-            canonical = _col(row, CANON_KEYS, cano or nm)
+            label = t.names[i] or _alias_to_zh(t.canons[i] or nm or cano)
+            canonical = t.canons[i] or cano or nm
         else:
             kcal = p = f = c = 0.0
             matched = False
@@ -340,6 +532,120 @@ def calc(items: List[Dict], include_garnish: bool = False):
     totals = {k: round(v, 1) for k, v in totals.items()}
     return enriched, totals
 
+def _round1(x):
+    """
+    與 Python round(x, 1) 結果相同的向量化版本：np.round 先乘 10 再取整，
+    剛好落在 .x5 附近時可能與 round() 不同，這些少數值改用 round() 重算。
+    """
+    r = np.round(x, 1)
+    scaled = x * 10.0
+    tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if tie.any():
+        r[tie] = [round(v, 1) for v in x[tie].tolist()]
+    return r
+
+def calc_many(meals: List[List[Dict]], include_garnish: bool = False) -> List[Tuple[List[Dict], Dict[str, float]]]:
+    """
+    批次版 calc：meals 為多餐的 items，回傳與逐餐呼叫 calc 相同的 [(enriched_items, totals), ...]。
+    整批不重複的 (name, canonical) 只解析一次；營養值以 重量向量 × per-100g 欄位 一次算完，
+    每餐合計用 bincount 分組加總。
+    """
+    if np is None:
+        return [calc(items, include_garnish=include_garnish) for items in meals]
+    s = _state()
+    t = s.table
+    meals = [_coerce_items(items) for items in meals]
+
+    # 原始 (name, canonical) -> (列索引 或 -1, label, canonical)
+    resolved: Dict[Tuple[Any, Any], Tuple[int, str, str]] = {}
+    flat: List[Dict] = []                 # 需要計算的項目（依出現順序）
+    hits: List[Tuple[int, str, str]] = []
+    meal_ids: List[int] = []
+    weights: List[float] = []
+    layout: List[List[Any]] = []          # 每餐每項：flat 的索引，或（配料）已組好的歸零結果
+
+    for m, items in enumerate(meals):
+        slots: List[Any] = []
+        for it in items:
+            if not include_garnish and bool(it.get("is_garnish")):
+                slots.append({
+                    **it,
+                    "kcal": 0.0, "protein_g": 0.0, "fat_g": 0.0, "carb_g": 0.0,
+                    "matched": False,
+                    "label": it.get("name") or it.get("canonical"),
+                })
+                continue
+
+            raw = (it.get("name"), it.get("canonical"))
+            try:
+                hit = resolved.get(raw)
+            except TypeError:  # 非字串（不可雜湊）的欄位：不快取
+                raw, hit = None, None
+            if hit is None:
+                nm = str(it.get("name") or "").strip()
+                cano = str(it.get("canonical") or "").strip()
+                started = time.perf_counter()
+                i, method = _resolve_method(nm, cano, s)
+                elapsed = time.perf_counter() - started
+                metrics.NUTRITION_LOOKUP_SECONDS.observe(elapsed, method=method)
+                metrics.record(f"nutrition_lookup:{method}", elapsed)
+                if i is not None:
+                    hit = (i, t.names[i] or _alias_to_zh(t.canons[i] or nm or cano), t.canons[i] or cano or nm)
+                else:
+                    hit = (-1, _alias_to_zh(nm or cano) or (nm or cano), cano or nm)
+                if raw is not None:
+                    resolved[raw] = hit
+
+            w = it.get("weight_g", 0.0)
+            w = float(w) if type(w) in (float, int) else _num(w, 0.0)
+            if w < 0:
+                w = 0.0
+            slots.append(len(flat))
+            flat.append(it)
+            hits.append(hit)
+            meal_ids.append(m)
+            weights.append(w)
+        layout.append(slots)
+
+    # 營養值：(n, 4) per-100g 矩陣 × 重量比例（逐項四捨五入），查無的項目為 0
+    n_meals = len(meals)
+    if flat:
+        idx = np.fromiter((h[0] for h in hits), dtype=np.intp, count=len(hits))
+        matched = idx >= 0
+        take = np.where(matched, idx, 0)
+        per100 = np.column_stack([
+            np.frombuffer(col, dtype=np.float64)[take] for col in (t.kcal, t.protein_g, t.fat_g, t.carb_g)
+        ])
+        ratio = np.asarray(weights, dtype=np.float64) / 100.0
+        values = _round1(per100 * ratio[:, None])
+        values[~matched] = 0.0
+        # 每餐合計：逐項四捨五入後再加總，與 calc 相同
+        ids = np.asarray(meal_ids, dtype=np.intp)
+        sums = np.stack([np.bincount(ids, weights=values[:, k], minlength=n_meals) for k in range(4)], axis=1)
+        totals_all = _round1(sums).tolist()
+        out = [
+            {
+                **it,
+                "label": label,
+                "canonical": canonical,
+                "kcal": kcal,
+                "protein_g": p,
+                "fat_g": f,
+                "carb_g": c,
+                "matched": i >= 0,
+            }
+            for it, (i, label, canonical), (kcal, p, f, c) in zip(flat, hits, values.tolist())
+        ]
+    else:
+        totals_all = [[0.0, 0.0, 0.0, 0.0]] * n_meals
+        out = []
+
+    results: List[Tuple[List[Dict], Dict[str, float]]] = []
+    for slots, (kcal, p, f, c) in zip(layout, totals_all):
+        enriched = [out[j] if type(j) is int else j for j in slots]
+        results.append((enriched, {"kcal": kcal, "protein_g": p, "fat_g": f, "carb_g": c}))
+    return results
+
 # 供路由直接使用：完成「影像→食材→計算」
 def analyze_and_calc(image_b64: str, include_garnish: bool = False):
     vision = vision_analyze_base64(image_b64)
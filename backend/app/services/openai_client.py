@@ -1,18 +1,54 @@
 # backend/app/services/openai_client.py
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
 import json
 import os
-from typing import Any, Dict, List
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
-from openai import OpenAI, OpenAIError
+import httpx
+from openai import APIStatusError, AsyncOpenAI, DefaultAsyncHttpxClient, OpenAI, OpenAIError
+
+from app.services import admission, metrics
+from app.services.admission import Overloaded
+from app.services.breaker import CircuitBreaker, CircuitOpen
+from app.services.latency import LatencyWindow
 
 # ===== 可調參數 =====
 PRIMARY_MODEL = os.getenv("VISION_PRIMARY_MODEL", "gpt-4o-mini")
 FALLBACK_MODEL = os.getenv("VISION_FALLBACK_MODEL", "gpt-4o")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# 非同步 client 的連線池上限（同一個 worker 可同時進行的視覺呼叫數）
+VISION_MAX_CONNECTIONS = int(os.getenv("VISION_MAX_CONNECTIONS", "100"))
+# 對沖（hedging）：主模型超過 p95 仍未回應時，同時送備援模型，取先回傳有效 JSON 者
+VISION_HEDGE = os.getenv("VISION_HEDGE", "0").lower() in ("1", "true", "yes", "on")
+VISION_HEDGE_QUANTILE = float(os.getenv("VISION_HEDGE_QUANTILE", "0.95"))
+VISION_HEDGE_MIN_DELAY = float(os.getenv("VISION_HEDGE_MIN_DELAY", "2.0"))          # 秒；deadline 下限
+VISION_HEDGE_DEFAULT_DELAY = float(os.getenv("VISION_HEDGE_DEFAULT_DELAY", "8.0"))  # 樣本不足時使用
+VISION_HEDGE_MIN_SAMPLES = int(os.getenv("VISION_HEDGE_MIN_SAMPLES", "20"))
+# 逾時與重試：SDK 預設 600 秒讀取逾時、重試 2 次，上游變慢時 worker 會被卡很久
+VISION_CONNECT_TIMEOUT = float(os.getenv("VISION_CONNECT_TIMEOUT", "5"))
+VISION_READ_TIMEOUT = float(os.getenv("VISION_READ_TIMEOUT", "30"))
+VISION_MAX_RETRIES = int(os.getenv("VISION_MAX_RETRIES", "1"))
+VISION_DEADLINE = float(os.getenv("VISION_DEADLINE", "45"))  # 秒；單次辨識（含備援/對沖）總時限，<=0 不限
+# 斷路器（每個模型各一個）
+VISION_BREAKER_WINDOW = int(os.getenv("VISION_BREAKER_WINDOW", "20"))
+VISION_BREAKER_MIN_CALLS = int(os.getenv("VISION_BREAKER_MIN_CALLS", "10"))
+VISION_BREAKER_FAILURE_RATE = float(os.getenv("VISION_BREAKER_FAILURE_RATE", "0.5"))
+VISION_BREAKER_SLOW_CALL = float(os.getenv("VISION_BREAKER_SLOW_CALL", "20"))      # 秒；超過算慢呼叫
+VISION_BREAKER_SLOW_RATE = float(os.getenv("VISION_BREAKER_SLOW_RATE", "0.8"))
+VISION_BREAKER_OPEN_SECONDS = float(os.getenv("VISION_BREAKER_OPEN_SECONDS", "30"))
+
+_TIMEOUT = httpx.Timeout(VISION_READ_TIMEOUT, connect=VISION_CONNECT_TIMEOUT)
 
 _client: OpenAI | None = None
+_async_client: AsyncOpenAI | None = None
 
 
 def _client_ok() -> OpenAI:
@@ -21,10 +57,39 @@ def _client_ok() -> OpenAI:
     if _client is None:
         if not OPENAI_API_KEY:
             raise RuntimeError("OPENAI_API_KEY is not set")
-        _client = OpenAI(api_key=OPENAI_API_KEY)
+        _client = OpenAI(api_key=OPENAI_API_KEY, timeout=_TIMEOUT, max_retries=VISION_MAX_RETRIES)
     return _client
 
 
+def _async_client_ok() -> AsyncOpenAI:
+    """Singleton AsyncOpenAI client；共用一個有連線池的 httpx.AsyncClient。"""
+    global _async_client
+    if _async_client is None:
+        if not OPENAI_API_KEY:
+            raise RuntimeError("OPENAI_API_KEY is not set")
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=VISION_MAX_CONNECTIONS,
+                max_keepalive_connections=VISION_MAX_CONNECTIONS,
+            ),
+        )
+        _async_client = AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            http_client=http_client,
+            timeout=_TIMEOUT,
+            max_retries=VISION_MAX_RETRIES,
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """關閉共用的非同步 client（應用程式關閉時呼叫）。"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+
 def _strip_data_url_prefix(b64: str) -> str:
     """去掉 data URL 前綴，保留純 base64。"""
     if not b64:
@@ -56,6 +121,13 @@ items ≈ [{"canonical":"miso soup"}, {"canonical":"silken tofu"}, {"canonical":
 ⚠️ Do NOT confuse fried/stir-fried noodles with soy-based shredded tofu (豆干絲/bean curd strips).
 If you see oily noodles with egg/meat/sprouts/greens, classify as 'fried noodles' or 'noodles', not 'shredded tofu'."""
 )
+USER_PROMPT = "Identify the dish and list only major components with grams."
+
+# 結果快取的版本：提示詞或模型一改，舊快取自動失效；調整 _post_fixup 規則時請遞增 FIXUP_VERSION
+FIXUP_VERSION = 1
+VISION_CACHE_VERSION = hashlib.sha256(
+    f"{SYSTEM_PROMPT}\0{USER_PROMPT}\0{PRIMARY_MODEL}\0{FALLBACK_MODEL}\0{FIXUP_VERSION}".encode("utf-8")
+).hexdigest()[:12]
 
 # === 同義詞收斂（canonical） ===
 _CANON_SUGGEST: Dict[str, str] = {
@@ -151,29 +223,30 @@ def _is_cold_shredded_tofu_pattern(canon_list: List[str], total_weight: float) -
     return has_tofu_shredded and has_cold_garnish and not has_hot_cues and (total_weight < 250)
 
 
+def _normalize_item(it: Dict[str, Any]) -> Dict[str, Any]:
+    """單一 item 的同義詞收斂與重量轉數字（不含跨 item 的修正規則）。"""
+    name = str(it.get("name") or "").strip()
+    canon_raw = str(it.get("canonical") or name).strip()
+    canon_key = _norm(canon_raw or name)
+    canonical = _CANON_SUGGEST.get(canon_key, canon_key) or "item"
+
+    w = it.get("weight_g", 0)
+    try:
+        weight = float(w) if w is not None else 0.0
+    except Exception:
+        weight = 0.0
+
+    return {
+        "name": name or canonical,
+        "canonical": canonical,
+        "weight_g": weight,
+        "is_garnish": bool(it.get("is_garnish", False)),
+    }
+
+
 def _post_fixup(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """收斂同義詞、估重、移除明顯誤判；偏向保留麵而非豆干絲。"""
-    prelim: List[Dict[str, Any]] = []
-    for it in items or []:
-        name = str(it.get("name") or "").strip()
-        canon_raw = str(it.get("canonical") or name).strip()
-        canon_key = _norm(canon_raw or name)
-        canonical = _CANON_SUGGEST.get(canon_key, canon_key) or "item"
-
-        w = it.get("weight_g", 0)
-        try:
-            weight = float(w) if w is not None else 0.0
-        except Exception:
-            weight = 0.0
-
-        prelim.append(
-            {
-                "name": name or canonical,
-                "canonical": canonical,
-                "weight_g": weight,
-                "is_garnish": bool(it.get("is_garnish", False)),
-            }
-        )
+    prelim: List[Dict[str, Any]] = [_normalize_item(it) for it in items or []]
 
     if not prelim:
         return []
@@ -207,30 +280,38 @@ def _post_fixup(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return fixed
 
 
-def _call_model(client: OpenAI, model: str, image_b64: str) -> Dict[str, Any]:
-    """呼叫模型（強制 JSON 輸出），回傳 {items, model, error}。"""
-    pure_b64 = _strip_data_url_prefix(image_b64)
+def _image_data_url(image: bytes | memoryview, mime: str = "image/jpeg") -> str:
+    """整條流程唯一一次 base64 編碼：送往 OpenAI 前才把位元組轉成 data URL。"""
+    return f"data:{mime};base64,{base64.b64encode(image).decode('ascii')}"
+
+
+def _b64_data_url(image_b64: str, mime: str = "image/jpeg") -> str:
+    return f"data:{mime};base64,{_strip_data_url_prefix(image_b64)}"
+
+
+def _build_messages(data_url: str, detail: str | None = None) -> List[Dict[str, Any]]:
+    image_url: Dict[str, Any] = {"url": data_url}
+    if detail:
+        image_url["detail"] = detail
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": USER_PROMPT},
+                {"type": "image_url", "image_url": image_url},
+            ],
+        },
+    ]
+
+
+class InvalidModelOutput(ValueError):
+    """模型回傳的不是 JSON 物件（對沖時視為該模型失敗）。"""
 
-    resp = client.chat.completions.create(
-        model=model,
-        response_format={"type": "json_object"},  # 強制 JSON 物件輸出
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": "Identify the dish and list only major components with grams."},
-                    {
-                        "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{pure_b64}"},
-                    },
-                ],
-            },
-        ],
-        temperature=0.2,
-    )
 
-    txt = (resp.choices[0].message.content or "").strip()
+def _parse_json(content: str | None) -> Optional[Dict[str, Any]]:
+    """解析模型回傳的 JSON 文字；不是 JSON 物件時回 None。"""
+    txt = (content or "").strip()
     # 有些情況會包在 ```json ... ```
     if txt.startswith("```"):
         txt = txt.strip("`")
@@ -240,12 +321,265 @@ def _call_model(client: OpenAI, model: str, image_b64: str) -> Dict[str, Any]:
     try:
         data = json.loads(txt)
     except Exception:
-        data = {"items": []}
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _parse_content(content: str | None) -> List[Dict[str, Any]]:
+    """解析模型回傳的 JSON 文字並做 _post_fixup。"""
+    with metrics.timed("json_parse"):
+        data = _parse_json(content) or {"items": []}
+    with metrics.timed("post_fixup"):
+        return _post_fixup(list(data.get("items") or []))
+
+
+# ===== 斷路器 =====
+_BREAKERS: Dict[str, CircuitBreaker] = {
+    model: CircuitBreaker(
+        model,
+        window=VISION_BREAKER_WINDOW,
+        min_calls=VISION_BREAKER_MIN_CALLS,
+        failure_rate=VISION_BREAKER_FAILURE_RATE,
+        slow_call_s=VISION_BREAKER_SLOW_CALL,
+        slow_rate=VISION_BREAKER_SLOW_RATE,
+        open_seconds=VISION_BREAKER_OPEN_SECONDS,
+    )
+    for model in (PRIMARY_MODEL, FALLBACK_MODEL)
+}
+
+
+def _is_upstream_failure(e: BaseException) -> bool:
+    # 4xx（429 除外）是請求本身的問題（例如圖片格式），不代表模型不健康
+    if isinstance(e, APIStatusError):
+        return e.status_code >= 500 or e.status_code == 429
+    return True
+
+
+def _observe_call(model: str, outcome: str, seconds: float) -> None:
+    metrics.VISION_CALL_SECONDS.observe(seconds, model=model, outcome=outcome)
+    metrics.record(f"vision_call:{model}", seconds)
+
+
+@contextmanager
+def _guarded(model: str) -> Iterator[None]:
+    """斷路器開啟時直接丟 CircuitOpen；否則記錄這次呼叫的成敗與耗時（斷路器 + metrics）。"""
+    breaker = _BREAKERS[model]
+    breaker.check()
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        elapsed = time.perf_counter() - started
+        if _is_upstream_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.release()
+        _observe_call(model, "error", elapsed)
+        raise
+    except BaseException:
+        # 被取消（對沖輸家、總時限到、用戶端斷線）：只有已經很慢的才計入
+        elapsed = time.perf_counter() - started
+        breaker.record_cancelled(elapsed)
+        _observe_call(model, "cancelled", elapsed)
+        raise
+    else:
+        elapsed = time.perf_counter() - started
+        breaker.record_success(elapsed)
+        _observe_call(model, "ok", elapsed)
+
+
+def breaker_stats() -> Dict[str, Any]:
+    return {model: b.stats() for model, b in _BREAKERS.items()}
+
+
+def _call_model(
+    client: OpenAI, model: str, image_b64: str, mime: str = "image/jpeg", detail: str | None = None
+) -> Dict[str, Any]:
+    """呼叫模型（強制 JSON 輸出），回傳 {items, model, error}。"""
+    with _guarded(model):
+        resp = client.chat.completions.create(
+            model=model,
+            response_format={"type": "json_object"},  # 強制 JSON 物件輸出
+            messages=_build_messages(_b64_data_url(image_b64, mime), detail),
+            temperature=0.2,
+        )
+    items = _parse_content(resp.choices[0].message.content)
+    return {"items": items, "model": model, "error": None}
 
-    items = _post_fixup(list(data.get("items") or []))
+
+async def _call_model_async(
+    client: AsyncOpenAI,
+    model: str,
+    data_url: str,
+    detail: str | None = None,
+    strict: bool = False,
+    tokens: int | None = None,
+) -> Dict[str, Any]:
+    """
+    _call_model 的非同步版本：等待模型時不佔住 event loop；data_url 由呼叫端組好。
+    strict=True 時輸出不是 JSON 物件會丟 InvalidModelOutput（對沖用）。
+    送出前先經過 admission 排隊（tokens 為預估用量），排不到會丟 Overloaded；
+    斷路器開啟時在排隊前就丟 CircuitOpen。
+    """
+    # 斷路器開啟時不進 admission 排隊：直接 CircuitOpen，讓呼叫端立刻改走備援
+    _BREAKERS[model].reject_if_open()
+    queued_at = time.perf_counter()
+    started: Optional[float] = None
+    try:
+        async with admission.limiter.slot(tokens or admission.estimate_tokens(0, 0, detail)):
+            metrics.observe_stage("admission_wait", time.perf_counter() - queued_at)
+            started = time.perf_counter()
+            with _guarded(model):
+                resp = await client.chat.completions.create(
+                    model=model,
+                    response_format={"type": "json_object"},
+                    messages=_build_messages(data_url, detail),
+                    temperature=0.2,
+                )
+                content = resp.choices[0].message.content
+                if strict and _parse_json(content) is None:
+                    raise InvalidModelOutput(f"{model} returned non-JSON output")
+    except asyncio.CancelledError:
+        # 主模型被取消（對沖輸給備援、總時限到）時，已經過的時間記為耗時的下限；
+        # 只記完成的呼叫會漏掉最慢的尾巴，hedge_delay 會一路往下掉、對沖越來越多
+        if model == PRIMARY_MODEL and started is not None:
+            _PRIMARY_LATENCY.add(time.perf_counter() - started)
+        raise
+    if model == PRIMARY_MODEL:
+        _PRIMARY_LATENCY.add(time.perf_counter() - started)
+    items = _parse_content(content)
     return {"items": items, "model": model, "error": None}
 
 
+class _ItemExtractor:
+    """
+    串流時逐段餵入模型輸出的 JSON 文字，找出 "items" 陣列中已經完整的物件。
+    只追蹤括號深度與字串狀態，不做完整 JSON 解析；最終結果仍以 _parse_content 為準。
+    """
+
+    _ITEMS_RE = re.compile(r'"items"\s*:\s*\[')
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.pos = -1          # 下一個要掃描的位置；-1 表示還沒找到 "items": [
+        self.depth = 0
+        self.start = -1
+        self.in_str = False
+        self.esc = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.text += chunk
+        out: List[Dict[str, Any]] = []
+        if self.closed:
+            return out
+        if self.pos < 0:
+            m = self._ITEMS_RE.search(self.text)
+            if m is None:
+                return out
+            self.pos = m.end()
+
+        t = self.text
+        i = self.pos
+        while i < len(t):
+            ch = t[i]
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+            elif ch == '"':
+                self.in_str = True
+            elif ch == "{":
+                if self.depth == 0:
+                    self.start = i
+                self.depth += 1
+            elif ch == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        obj = json.loads(t[self.start:i + 1])
+                    except Exception:
+                        obj = None
+                    if isinstance(obj, dict):
+                        out.append(obj)
+                    self.start = -1
+            elif ch == "]" and self.depth == 0:
+                self.closed = True
+                i += 1
+                break
+            i += 1
+        self.pos = i
+        return out
+
+
+async def _stream_model_async(
+    client: AsyncOpenAI, model: str, data_url: str, detail: str | None = None, tokens: int | None = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """以 stream=True 呼叫模型：每完成一個 item 就送出暫定結果，最後送出完整結果。"""
+    parts: List[str] = []
+    extractor = _ItemExtractor()
+    _BREAKERS[model].reject_if_open()
+    queued_at = time.perf_counter()
+    async with admission.limiter.slot(tokens or admission.estimate_tokens(0, 0, detail)):
+        metrics.observe_stage("admission_wait", time.perf_counter() - queued_at)
+        with _guarded(model):
+            stream = await client.chat.completions.create(
+                model=model,
+                response_format={"type": "json_object"},
+                messages=_build_messages(data_url, detail),
+                temperature=0.2,
+                stream=True,
+            )
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    parts.append(delta)
+                    for it in extractor.feed(delta):
+                        item = _normalize_item(it)
+                        item["weight_g"] = round(item["weight_g"], 1)
+                        yield {"type": "item", "item": item, "model": model}
+            finally:
+                await stream.close()
+    yield {"type": "result", "items": _parse_content("".join(parts)), "model": model, "error": None}
+
+
+async def vision_stream_bytes_async(
+    image: bytes | memoryview, mime: str = "image/jpeg", detail: str | None = None, tokens: int | None = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    vision_analyze_bytes_async 的串流版本，依序產生：
+    - {"type": "item", "item", "model"}：模型剛寫完的 item（暫定，尚未套用跨 item 修正）
+    - {"type": "retry", "model"}：主模型失敗改用備援，之前的暫定 item 作廢
+    - {"type": "result", "items", "model", "error"}：最終結果，格式同非串流版本
+    """
+    data_url = _image_data_url(image, mime)
+    client = _async_client_ok()
+    token = admission.deadline.set(_deadline_at())
+    try:
+        async with asyncio.timeout(VISION_DEADLINE if VISION_DEADLINE > 0 else None):
+            try:
+                async for ev in _stream_model_async(client, PRIMARY_MODEL, data_url, detail, tokens):
+                    yield ev
+            except (OpenAIError, CircuitOpen):
+                # 轉用備援模型
+                yield {"type": "retry", "model": FALLBACK_MODEL}
+                async for ev in _stream_model_async(client, FALLBACK_MODEL, data_url, detail, tokens):
+                    yield ev
+    except TimeoutError:
+        yield {"type": "result", "items": [], "model": PRIMARY_MODEL, "error": _deadline_error()}
+    except Exception as e:
+        yield {"type": "result", "items": [], "model": PRIMARY_MODEL, "error": _error_text(e)}
+    finally:
+        admission.deadline.reset(token)
+
+
 def vision_analyze_base64(image_b64: str) -> Dict[str, Any]:
     """
     以 base64 圖片做食材抽取。固定回傳：
@@ -255,8 +589,163 @@ def vision_analyze_base64(image_b64: str) -> Dict[str, Any]:
     try:
         try:
             return _call_model(client, PRIMARY_MODEL, image_b64)
-        except OpenAIError:
+        except (OpenAIError, CircuitOpen):
             # 轉用備援模型
             return _call_model(client, FALLBACK_MODEL, image_b64)
     except Exception as e:
         return {"items": [], "model": PRIMARY_MODEL, "error": f"{type(e).__name__}: {e}"}
+
+
+# ===== 對沖統計 =====
+_PRIMARY_LATENCY = LatencyWindow(maxlen=200)  # 主模型呼叫的耗時：成功的實際值 + 被取消的已過時間（下限）
+
+
+class _HedgeStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0          # 超過 deadline 後另送備援
+        self.failovers = 0       # deadline 前主模型就失敗，直接改送備援
+        self.primary_wins = 0
+        self.fallback_wins = 0
+        self.errors = 0
+
+    def incr(self, **counts: int) -> None:
+        with self._lock:
+            for k, v in counts.items():
+                setattr(self, k, getattr(self, k) + v)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "failovers": self.failovers,
+                "primary_wins": self.primary_wins,
+                "fallback_wins": self.fallback_wins,
+                "errors": self.errors,
+            }
+        out["hedge_rate"] = round(out["hedged"] / out["requests"], 4) if out["requests"] else 0.0
+        return out
+
+
+_HEDGE_STATS = _HedgeStats()
+
+
+def hedge_delay() -> float:
+    """目前的對沖 deadline（秒）：主模型近期耗時的 p95，不低於 VISION_HEDGE_MIN_DELAY。"""
+    if len(_PRIMARY_LATENCY) < VISION_HEDGE_MIN_SAMPLES:
+        return VISION_HEDGE_DEFAULT_DELAY
+    q = _PRIMARY_LATENCY.quantile(VISION_HEDGE_QUANTILE) or VISION_HEDGE_DEFAULT_DELAY
+    return max(VISION_HEDGE_MIN_DELAY, q)
+
+
+def hedge_stats() -> Dict[str, Any]:
+    return {
+        "enabled": VISION_HEDGE,
+        "delay_s": round(hedge_delay(), 3),
+        "primary_latency": _PRIMARY_LATENCY.stats(),
+        **_HEDGE_STATS.snapshot(),
+    }
+
+
+async def _vision_hedged(
+    client: AsyncOpenAI, data_url: str, detail: str | None, tokens: int | None = None
+) -> Dict[str, Any]:
+    """
+    主模型先送；超過 hedge_delay() 仍未回應（或已失敗）就同時送備援模型，
+    取先回傳有效 JSON 的結果，另一個取消。主模型就被 admission 拒絕時不再加送。
+    """
+    _HEDGE_STATS.incr(requests=1)
+    primary = asyncio.create_task(
+        _call_model_async(client, PRIMARY_MODEL, data_url, detail, strict=True, tokens=tokens)
+    )
+    tasks = {primary: PRIMARY_MODEL}
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=hedge_delay())
+        last_exc: Optional[BaseException] = None
+        if done:
+            if primary.exception() is None:
+                _HEDGE_STATS.incr(primary_wins=1)
+                return primary.result()
+            last_exc = primary.exception()
+            if isinstance(last_exc, Overloaded):
+                _HEDGE_STATS.incr(errors=1)
+                raise last_exc
+            _HEDGE_STATS.incr(failovers=1)
+        else:
+            _HEDGE_STATS.incr(hedged=1)
+
+        fallback = asyncio.create_task(
+            _call_model_async(client, FALLBACK_MODEL, data_url, detail, strict=True, tokens=tokens)
+        )
+        tasks[fallback] = FALLBACK_MODEL
+        pending = {t for t in tasks if not t.done()}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for t in done:
+                if t.exception() is None:
+                    if tasks[t] == PRIMARY_MODEL:
+                        _HEDGE_STATS.incr(primary_wins=1)
+                    else:
+                        _HEDGE_STATS.incr(fallback_wins=1)
+                    return t.result()
+                last_exc = t.exception()
+        _HEDGE_STATS.incr(errors=1)
+        e = last_exc or RuntimeError("no result")
+        return {"items": [], "model": PRIMARY_MODEL, "error": _error_text(e)}
+    finally:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+
+
+def _deadline_error() -> str:
+    return f"DeadlineExceeded: no result within {VISION_DEADLINE:g}s"
+
+
+def _deadline_at() -> Optional[float]:
+    return asyncio.get_running_loop().time() + VISION_DEADLINE if VISION_DEADLINE > 0 else None
+
+
+def _error_text(e: BaseException) -> str:
+    # admission 拒絕時保留 overloaded:<reason>，讓 router 對應成 503
+    if isinstance(e, Overloaded):
+        return e.code
+    return f"{type(e).__name__}: {e}"
+
+
+async def _vision_async(data_url: str, detail: str | None, tokens: int | None = None) -> Dict[str, Any]:
+    """
+    主模型 → 備援模型（或對沖），整體受 VISION_DEADLINE 限制。
+    主模型斷路器開啟時直接走備援；兩個都開啟時立即回錯誤，不送出請求。
+    admission 排不進去（Overloaded）時不改送備援，直接回 overloaded:<reason>。
+    """
+    client = _async_client_ok()
+    token = admission.deadline.set(_deadline_at())
+    try:
+        async with asyncio.timeout(VISION_DEADLINE if VISION_DEADLINE > 0 else None):
+            if VISION_HEDGE:
+                return await _vision_hedged(client, data_url, detail, tokens)
+            try:
+                return await _call_model_async(client, PRIMARY_MODEL, data_url, detail, tokens=tokens)
+            except (OpenAIError, CircuitOpen):
+                # 轉用備援模型
+                return await _call_model_async(client, FALLBACK_MODEL, data_url, detail, tokens=tokens)
+    except TimeoutError:
+        return {"items": [], "model": PRIMARY_MODEL, "error": _deadline_error()}
+    except Exception as e:
+        return {"items": [], "model": PRIMARY_MODEL, "error": _error_text(e)}
+    finally:
+        admission.deadline.reset(token)
+
+
+async def vision_analyze_bytes_async(
+    image: bytes | memoryview, mime: str = "image/jpeg", detail: str | None = None, tokens: int | None = None
+) -> Dict[str, Any]:
+    """
+    以圖片位元組做食材抽取（非同步）；mime/detail 來自前處理結果，
+    tokens 為預估用量（admission 的 TPM 預算用，沒給就依 detail 粗估）。
+    回傳格式同 vision_analyze_base64。
+    """
+    return await _vision_async(_image_data_url(image, mime), detail, tokens)
@@ -0,0 +1,111 @@
+# backend/app/services/phash.py
+from __future__ import annotations
+
+import io
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Pillow 沒裝時整個近似快取停用，不影響主流程
+try:
+    from PIL import Image  # type: ignore
+except Exception:
+    Image = None
+
+# ===== 可調參數 =====
+VISION_PHASH_ENABLED = os.getenv("VISION_PHASH_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+VISION_PHASH_MAX_DISTANCE = int(os.getenv("VISION_PHASH_MAX_DISTANCE", "10"))  # 192 bits 中允許不同的位元數
+VISION_PHASH_SIZE = int(os.getenv("VISION_PHASH_SIZE", "256"))                # 保留最近幾張圖
+VISION_PHASH_TTL = float(os.getenv("VISION_PHASH_TTL", "600"))                # 秒
+
+HASH_BITS = 192
+
+
+def dhash(image: bytes) -> Optional[int]:
+    """
+    192-bit difference hash：縮成 9x8 後，R/G/B 各自比較左右相鄰像素（各 64 bits）。
+    重新壓縮 JPEG、微小位移或亮度差異，hash 只會差幾個位元；
+    分通道計算是為了避免灰階亮度相近、但顏色不同的菜被當成同一盤。
+    """
+    if Image is None or not image:
+        return None
+    try:
+        with Image.open(io.BytesIO(image)) as im:
+            # JPEG 可直接以縮小的解析度解碼，大圖也很快
+            im.draft("RGB", (64, 64))
+            small = im.convert("RGB").resize((9, 8), Image.BILINEAR)
+            channels = [list(band.getdata()) for band in small.split()]
+    except Exception:
+        return None
+    h = 0
+    for px in channels:
+        for row in range(8):
+            base = row * 9
+            for col in range(8):
+                h = (h << 1) | (px[base + col] > px[base + col + 1])
+    return h
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PerceptualIndex:
+    """最近圖片的 dHash -> 視覺結果；線性掃描（筆數小，一次查詢為微秒等級）。"""
+
+    def __init__(self, max_distance: int, maxlen: int, ttl: Optional[float]):
+        self.max_distance = max_distance
+        self.ttl = ttl if ttl and ttl > 0 else None
+        # (hash, include_garnish, expires_at, value)
+        self._entries: Deque[Tuple[int, bool, Optional[float], Dict[str, Any]]] = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    def lookup(self, h: int, include_garnish: bool) -> Optional[Tuple[Dict[str, Any], int]]:
+        """回傳 (結果, Hamming 距離)；找不到門檻內的圖則 None。"""
+        now = time.monotonic()
+        best: Optional[Tuple[Dict[str, Any], int]] = None
+        with self._lock:
+            self.lookups += 1
+            for eh, eg, expires_at, value in self._entries:
+                if eg != include_garnish or (expires_at is not None and expires_at <= now):
+                    continue
+                d = hamming(h, eh)
+                if d <= self.max_distance and (best is None or d < best[1]):
+                    best = (value, d)
+                    if d == 0:
+                        break
+            if best is not None:
+                self.hits += 1
+        return best
+
+    def add(self, h: int, include_garnish: bool, value: Dict[str, Any]) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries.append((h, include_garnish, expires_at, value))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "max_distance": self.max_distance,
+        }
+
+
+def similarity(distance: int) -> float:
+    return round(1.0 - distance / HASH_BITS, 3)
+
+
+def enabled() -> bool:
+    return VISION_PHASH_ENABLED and Image is not None
+
+
+index = PerceptualIndex(
+    max_distance=VISION_PHASH_MAX_DISTANCE,
+    maxlen=VISION_PHASH_SIZE,
+    ttl=VISION_PHASH_TTL,
+)
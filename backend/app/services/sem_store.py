@@ -0,0 +1,186 @@
+# backend/app/services/sem_store.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 語意索引的磁碟格式：
+#   <prefix>.<sha>.npy  向量矩陣（float32 預設；float16 / int8 可再省空間），以 mmap 唯讀載入；
+#                       檔名含內容雜湊，新舊版本不會寫到同一個檔案
+#   <prefix>.json       sidecar：版本、模型、維度、dtype、labels、items，"vectors" 指向上面的 .npy
+# 多個 uvicorn worker 載入同一個 .npy 時共用 OS page cache，不各自複製一份。
+FORMAT = "eatlyze.sem_index"
+VERSION = 1
+DTYPES = ("float32", "float16", "int8")
+
+
+@dataclass
+class SemIndexData:
+    model: str
+    labels: List[str]
+    items: List[Dict[str, Any]]
+    matrix: Any                       # (n, dim)；float32 且已正規化時可直接做 cosine
+    inv_norms: Optional[Any] = None   # 非 float32 或未正規化時，每列的 1/‖v‖（scores 需再乘上）
+    meta: Dict[str, Any] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def normalized(self) -> Any:
+        """正規化後的 float32 矩陣（已是 float32 且正規化時不複製）。"""
+        if self.inv_norms is None and self.matrix.dtype == np.float32:
+            return self.matrix
+        return np.asarray(self.matrix, dtype=np.float32) * (self.inv_norms[:, None] if self.inv_norms is not None else 1.0)
+
+    def scores(self, q) -> Any:
+        """q 為已正規化的 float32 查詢向量，回傳每列的 cosine。"""
+        s = self.matrix @ q if self.matrix.dtype == np.float32 else self.matrix.astype(np.float32) @ q
+        return s * self.inv_norms if self.inv_norms is not None else s
+
+
+def prefix_of(path: str) -> str:
+    """sem_index / sem_index.json / sem_index.npy / sem_index.pkl 都對應到同一個 prefix。"""
+    root, ext = os.path.splitext(path)
+    return root if ext in (".json", ".npy", ".pkl") else path
+
+
+def vectors_path(prefix: str, meta: Dict[str, Any]) -> str:
+    """sidecar 指向的向量檔；舊的 sidecar 沒有 "vectors" 時為 <prefix>.npy。"""
+    return os.path.join(os.path.dirname(prefix), meta.get("vectors") or os.path.basename(prefix) + ".npy")
+
+
+def _read_meta(prefix: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(prefix + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _quantize(matrix, dtype: str):
+    if dtype == "float32":
+        return matrix.astype(np.float32)
+    if dtype == "float16":
+        return matrix.astype(np.float16)
+    # int8：每列各自縮放到 [-127, 127]；cosine 與縮放無關，載入時再以 1/‖x‖ 還原
+    peak = np.abs(matrix).max(axis=1, keepdims=True)
+    return np.round(matrix / np.where(peak == 0, 1.0, peak) * 127).astype(np.int8)
+
+
+def _atomic_write(path: str, write) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def save(
+    prefix: str,
+    labels: Sequence[str],
+    embeddings: Any,
+    items: Sequence[Dict[str, Any]],
+    model: str,
+    dtype: str = "float32",
+) -> Dict[str, Any]:
+    """
+    寫出 <prefix>.<sha>.npy 與 <prefix>.json（各自先寫暫存檔再 rename）；
+    向量先正規化再存，float32 載入後不需要任何轉換。回傳 sidecar 內容。
+
+    換上 sidecar 是唯一的切換點：向量檔名含內容雜湊、先寫好，sidecar 最後才換，
+    載入端讀到的 labels 與向量一定是同一版。舊的向量檔在切換後刪除
+    （已 mmap 的 worker 不受影響）。
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or len(matrix) != len(labels):
+        raise ValueError(f"embeddings shape {matrix.shape} does not match {len(labels)} labels")
+    stored = np.ascontiguousarray(_quantize(_normalize(matrix), dtype))
+
+    digest = hashlib.sha256(f"{stored.dtype}:{stored.shape}:".encode("ascii"))
+    digest.update(stored.data)
+    vectors = f"{os.path.basename(prefix)}.{digest.hexdigest()[:16]}.npy"
+    meta = {
+        "format": FORMAT,
+        "version": VERSION,
+        "model": model,
+        "count": int(stored.shape[0]),
+        "dim": int(stored.shape[1]),
+        "dtype": dtype,
+        "normalized": True,
+        "vectors": vectors,
+        "labels": list(labels),
+        "items": list(items),
+    }
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    previous = _read_meta(prefix)
+    npy_path = vectors_path(prefix, meta)
+    if not os.path.exists(npy_path):
+        _atomic_write(npy_path, lambda f: np.save(f, stored, allow_pickle=False))
+    _atomic_write(prefix + ".json", lambda f: f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8")))
+    if previous is not None:
+        old_path = vectors_path(prefix, previous)
+        if os.path.abspath(old_path) != os.path.abspath(npy_path) and os.path.exists(old_path):
+            os.unlink(old_path)
+    return meta
+
+
+def load(prefix: str, mmap: bool = True) -> SemIndexData:
+    """載入二進位格式（.json + .npy）；只有舊的 .pkl 時改讀 pickle。"""
+    prefix = prefix_of(prefix)
+    if os.path.exists(prefix + ".json"):
+        try:
+            return _load_binary(prefix, mmap)
+        except FileNotFoundError:
+            # 讀到舊 sidecar 後，它指向的向量檔剛好被新版本 save 刪掉：重讀一次新的 sidecar
+            return _load_binary(prefix, mmap)
+    if os.path.exists(prefix + ".pkl"):
+        return load_pickle(prefix + ".pkl")
+    raise FileNotFoundError(f"semantic index not found: {prefix}.json / {prefix}.pkl")
+
+
+def _load_binary(prefix: str, mmap: bool) -> SemIndexData:
+    with open(prefix + ".json", "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format") != FORMAT or meta.get("version") != VERSION:
+        raise ValueError(f"unsupported index format {meta.get('format')!r} v{meta.get('version')}")
+    matrix = np.load(vectors_path(prefix, meta), mmap_mode="r" if mmap else None, allow_pickle=False)
+    if matrix.shape != (meta["count"], meta["dim"]) or str(matrix.dtype) != meta["dtype"]:
+        raise ValueError(f"vectors {matrix.shape}/{matrix.dtype} do not match sidecar")
+    labels = meta.pop("labels")
+    items = meta.pop("items") or [{} for _ in labels]
+    inv_norms = None
+    if matrix.dtype != np.float32 or not meta.get("normalized"):
+        norms = np.sqrt(np.einsum("ij,ij->i", matrix, matrix, dtype=np.float32))
+        inv_norms = (1.0 / np.where(norms == 0, 1.0, norms)).astype(np.float32)
+    return SemIndexData(meta.get("model") or "", labels, items, matrix, inv_norms, meta)
+
+
+def load_pickle(path: str) -> SemIndexData:
+    """舊格式：{"labels", "embeddings": List[List[float]], "items", "model"}。"""
+    with open(path, "rb") as f:
+        payload = pickle.load(f)
+    labels = list(payload["labels"])
+    matrix = np.asarray(payload["embeddings"], dtype=np.float32)
+    if matrix.ndim != 2 or len(matrix) != len(labels):
+        raise ValueError(f"bad embeddings shape {matrix.shape}")
+    items = list(payload.get("items") or [{} for _ in labels])
+    meta = {"format": "pickle", "model": payload.get("model") or "", "count": len(labels), "dim": int(matrix.shape[1])}
+    return SemIndexData(meta["model"], labels, items, _normalize(matrix).astype(np.float32), None, meta)
@@ -0,0 +1,152 @@
+# backend/app/services/semantic_match.py
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from app.services import log, metrics
+from app.services.lru import LRUCache, MISSING
+
+# NumPy 沒裝時語意比對停用，名稱解析照舊走精確/別名/模糊
+try:
+    import numpy as np  # type: ignore
+    from app.services import ann, sem_store
+except Exception:
+    np = None
+    ann = sem_store = None
+
+# ===== 可調參數 =====
+SEMANTIC_MATCH_ENABLED = os.getenv("SEMANTIC_MATCH_ENABLED", "0").lower() in ("1", "true", "yes", "on")
+# 索引 prefix：優先讀 sem_index.json + 它指向的 .npy（mmap），沒有才讀舊的 sem_index.pkl
+SEMANTIC_INDEX_PATH = os.getenv(
+    "SEMANTIC_INDEX_PATH",
+    os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "sem_index")),
+)
+# cosine 相似度下限；text-embedding-3-small 對不相干的食物（豬排 vs 牛排）也常有 0.5 以上
+SEMANTIC_MIN_SCORE = float(os.getenv("SEMANTIC_MIN_SCORE", "0.65"))
+SEMANTIC_TOP_K = int(os.getenv("SEMANTIC_TOP_K", "3"))
+SEMANTIC_QUERY_CACHE_SIZE = int(os.getenv("SEMANTIC_QUERY_CACHE_SIZE", "4096"))
+SEMANTIC_EMBED_TIMEOUT = float(os.getenv("SEMANTIC_EMBED_TIMEOUT", "3"))  # 秒；查詢向量的 embeddings 呼叫
+
+logger = log.get_logger("eatlyze.semantic")
+
+# texts, model -> 每個 text 一個向量
+Embedder = Callable[[List[str], str], List[List[float]]]
+
+
+class SemanticUnavailable(Exception):
+    """查詢向量暫時取不到（embeddings API 失敗 / 逾時）；呼叫端不應快取這次的查無結果。"""
+
+
+def _embed_openai(texts: List[str], model: str) -> List[List[float]]:
+    from app.services.openai_client import _client_ok
+
+    client = _client_ok().with_options(timeout=SEMANTIC_EMBED_TIMEOUT, max_retries=0)
+    res = client.embeddings.create(model=model, input=texts)
+    return [d.embedding for d in res.data]
+
+
+def _query_key(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+class SemanticMatcher:
+    """
+    以 build_index.py 產生的語意索引做比對：
+    向量以 mmap 載入（已正規化的 float32），每次查詢只做一次矩陣×向量取 top-k；
+    詞彙量大時可改用 ANN 索引（SEMANTIC_ANN_BACKEND，見 ann.py）；
+    查詢字串的向量放在 LRU（同一個 canonical 只呼叫一次 embeddings）。
+    """
+
+    def __init__(self, path: str, embed: Embedder = _embed_openai, cache_size: int = SEMANTIC_QUERY_CACHE_SIZE):
+        self.path = path
+        self._embed = embed
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._failed = False
+        self.model = ""
+        self.labels: List[str] = []
+        self.items: List[Dict[str, Any]] = []
+        self._index = None
+        self._ann = None
+        self._queries = LRUCache(maxsize=cache_size)
+        self.embed_calls = 0
+        self.embed_errors = 0
+
+    def load(self) -> bool:
+        """載入索引（可重複呼叫）；檔案不存在或格式錯誤時回 False 並停用。"""
+        if self._loaded or self._failed:
+            return self._loaded
+        with self._lock:
+            if self._loaded or self._failed:
+                return self._loaded
+            try:
+                index = sem_store.load(self.path)
+                if ann.SEMANTIC_ANN_BACKEND != "exact" and len(index) >= ann.SEMANTIC_ANN_MIN_SIZE:
+                    self._ann = ann.build(index.normalized())
+            except Exception as e:
+                self._failed = True
+                logger.warning("semantic index unavailable", extra={"path": self.path, "error": f"{type(e).__name__}: {e}"})
+                return False
+            self.model = index.model
+            self.labels = index.labels
+            self.items = index.items
+            self._index = index
+            self._loaded = True
+            logger.info(
+                "semantic index loaded",
+                extra={"labels": len(index), "dim": index.matrix.shape[1], "dtype": str(index.matrix.dtype),
+                       "format": index.meta.get("format"), "model": index.model,
+                       "ann": self._ann.name if self._ann is not None else "exact"},
+            )
+            return True
+
+    def query_vector(self, text: str):
+        key = _query_key(text)
+        vec = self._queries.get(key)
+        if vec is not MISSING:
+            return vec
+        try:
+            with metrics.timed("semantic_embed"):
+                raw = self._embed([text], self.model)[0]
+            self.embed_calls += 1
+        except Exception as e:
+            self.embed_errors += 1
+            raise SemanticUnavailable(f"{type(e).__name__}: {e}") from e
+        vec = np.asarray(raw, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        if norm:
+            vec /= norm
+        self._queries.put(key, vec)
+        return vec
+
+    def search(self, text: str, k: int = SEMANTIC_TOP_K, min_score: float = SEMANTIC_MIN_SCORE) -> List[Tuple[int, float]]:
+        """回傳 [(索引位置, cosine)]，依相似度由高到低、且不低於 min_score。"""
+        if not text or not self.load() or not self.labels:
+            return []
+        q = self.query_vector(text)
+        if self._ann is not None:
+            ids, scores = self._ann.search(q, k)
+        else:
+            ids, scores = ann.top_k(self._index.scores(q), k)
+        return [(int(i), float(s)) for i, s in zip(ids, scores) if s >= min_score]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "labels": len(self.labels),
+            "model": self.model,
+            "dtype": str(self._index.matrix.dtype) if self._index is not None else None,
+            "ann": {"backend": self._ann.name, **self._ann.params()} if self._ann is not None else {"backend": "exact"},
+            "embed_calls": self.embed_calls,
+            "embed_errors": self.embed_errors,
+            "query_cache": self._queries.stats(),
+        }
+
+
+matcher = SemanticMatcher(SEMANTIC_INDEX_PATH)
+
+
+def enabled() -> bool:
+    return SEMANTIC_MATCH_ENABLED and np is not None and not matcher._failed
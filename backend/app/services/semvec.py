@@ -2,18 +2,38 @@
 from __future__ import annotations
 
 import os
-from typing import List, Dict, Optional, Tuple
-from dataclasses import dataclass
+import random
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import APIConnectionError, APIStatusError, APITimeoutError, OpenAI
 from openai.types import CreateEmbeddingResponse
 
+from app.services import log
+from app.services.embed_cache import EmbeddingCache, make_key
+
 load_dotenv()  # 允許用 .env 設 OPENAI_API_KEY
 
 # 你可改這行成 "text-embedding-3-large"
 DEFAULT_EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
 
+# ===== 可調參數 =====
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "128"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))        # 同時進行的批次數
+EMBED_TPM = int(os.getenv("EMBED_TPM", "0"))                        # 每分鐘 token 預算；0 表示不限
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "6"))        # 429 / 5xx / 連線錯誤的重試次數
+EMBED_BACKOFF_BASE = float(os.getenv("EMBED_BACKOFF_BASE", "1"))    # 秒；第 n 次重試等 base·2^n（含抖動）
+EMBED_BACKOFF_MAX = float(os.getenv("EMBED_BACKOFF_MAX", "60"))
+
+logger = log.get_logger("eatlyze.semvec")
+
+# 每批完成時呼叫：(批次起點, 該批文字, 該批向量)；完成順序不固定
+OnBatch = Callable[[int, List[str], List[List[float]]], None]
+
 def _coerce_texts(texts) -> List[str]:
     """
     將輸入整齊化成「非空字串陣列」；自動轉型並去掉空白與 None。
@@ -37,30 +57,81 @@ def _coerce_texts(texts) -> List[str]:
             clean.append(s)
     return clean
 
+def estimate_tokens(texts: List[str]) -> int:
+    """粗估 token：UTF-8 每 3 bytes 約 1 token（中文一字一 token，英文偏保守）。"""
+    return sum(max(1, len(t.encode("utf-8")) // 3) for t in texts)
+
+
+class _TokenBucket:
+    """每分鐘 token 預算（多執行緒共用）；acquire 會阻塞到有足夠額度。"""
+
+    def __init__(self, tpm: int):
+        self.capacity = float(tpm) if tpm > 0 else 0.0
+        self.rate = self.capacity / 60.0
+        self._level = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> None:
+        if not self.rate:
+            return
+        # 單批超過整個預算也要能送出（等 bucket 滿就放行）
+        cost = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._level = min(self.capacity, self._level + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._level >= cost:
+                    self._level -= cost
+                    return
+                delay = (cost - self._level) / self.rate
+            time.sleep(delay)
+
+
+def _is_retryable(e: BaseException) -> bool:
+    if isinstance(e, APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    return isinstance(e, (APIConnectionError, APITimeoutError))
+
+
+def _retry_after(e: BaseException) -> Optional[float]:
+    """429 回應的 Retry-After（秒）；沒有就回 None。"""
+    response = getattr(e, "response", None)
+    try:
+        value = response.headers.get("retry-after") if response is not None else None
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+
 @dataclass
 class SemanticIndex:
     model_name: str = DEFAULT_EMBED_MODEL
+    # 有給就只嵌入快取裡沒有的標籤（見 embed_cache.py）
+    cache: Optional[EmbeddingCache] = None
+    # 最近一次 build 的統計：labels / unique / reused / new
+    build_stats: Dict[str, int] = field(default_factory=dict)
+    concurrency: int = EMBED_CONCURRENCY
+    tpm: int = EMBED_TPM
+    max_retries: int = EMBED_MAX_RETRIES
 
     def __post_init__(self):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY not set. export 或 .env 設好後再試。")
-        self.client = OpenAI(api_key=api_key)
+        # 重試由 _embed_batch 自己做（要配合 TPM 預算與 Retry-After），SDK 不再重試
+        self.client = OpenAI(api_key=api_key, max_retries=0)
+        self._bucket = _TokenBucket(self.tpm)
         self._labels: List[str] = []
         self._items: List[Dict] = []
         self._emb: Optional[List[List[float]]] = None
 
-    def encode(self, texts, batch_size: int = 128) -> List[List[float]]:
-        """
-        以批次呼叫 embeddings.create，並確保 input 合規。
-        """
-        arr = _coerce_texts(texts)
-        if not arr:
-            raise ValueError("Embeddings input 为空或不合法（整理後沒有任何非空字串）")
-
-        vecs: List[List[float]] = []
-        for i in range(0, len(arr), batch_size):
-            chunk = arr[i:i + batch_size]
+    def _embed_batch(self, chunk: List[str]) -> List[List[float]]:
+        """送出一批；429 / 5xx / 連線錯誤以指數退避重試，其他錯誤直接往上丟。"""
+        tokens = estimate_tokens(chunk)
+        for attempt in range(self.max_retries + 1):
+            self._bucket.acquire(tokens)
             try:
                 # OpenAI Python SDK v1.53：input 接 str 或 List[str]
                 res: CreateEmbeddingResponse = self.client.embeddings.create(
@@ -68,12 +139,65 @@ class SemanticIndex:
                     input=chunk
                 )
             except Exception as e:
-                raise RuntimeError(f"[embeddings] API 失敗：{e}") from e
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise RuntimeError(f"[embeddings] API 失敗：{e}") from e
+                delay = _retry_after(e) or min(EMBED_BACKOFF_MAX, EMBED_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning(
+                    "embeddings retry",
+                    extra={"attempt": attempt + 1, "delay_s": round(delay, 2), "size": len(chunk), "error": f"{type(e).__name__}: {e}"},
+                )
+                time.sleep(delay)
+                continue
+            # API 依 index 回傳；排序後才與 chunk 一一對應
+            vecs = [d.embedding for d in sorted(res.data, key=lambda d: d.index)]
+            if len(vecs) != len(chunk):
+                raise RuntimeError(f"[embeddings] 回傳 {len(vecs)} 筆，預期 {len(chunk)} 筆")
+            return vecs
+        raise AssertionError("unreachable")
+
+    def encode(self, texts, batch_size: int = EMBED_BATCH_SIZE, on_batch: Optional[OnBatch] = None) -> List[List[float]]:
+        """
+        以批次呼叫 embeddings.create，並確保 input 合規。
+        最多 concurrency 批同時進行、受 TPM 預算節流；輸出順序與整理後的輸入相同。
+        on_batch 在每批完成時呼叫（用來寫 checkpoint）；任一批最終失敗時取消其餘未開始的批次。
+        """
+        arr = _coerce_texts(texts)
+        if not arr:
+            raise ValueError("Embeddings input 为空或不合法（整理後沒有任何非空字串）")
+        return self._encode_batches(arr, batch_size, on_batch)
+
+    def _encode_batches(self, arr: List[str], batch_size: int, on_batch: Optional[OnBatch]) -> List[List[float]]:
+        """arr 須已整理過（不再 strip / 去空值），on_batch 的起點才會與 arr 的位置一致。"""
+        starts = list(range(0, len(arr), batch_size))
+        results: List[Optional[List[List[float]]]] = [None] * len(starts)
 
-            # 取出向量
-            for d in res.data:
-                vecs.append(d.embedding)
+        def finished(fut) -> None:
+            n = futures[fut]
+            results[n] = fut.result()
+            if on_batch is not None:
+                on_batch(starts[n], arr[starts[n]:starts[n] + batch_size], results[n])
 
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(starts)))) as pool:
+            futures = {pool.submit(self._embed_batch, arr[s:s + batch_size]): n for n, s in enumerate(starts)}
+            pending = set(futures)
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_EXCEPTION)
+                    # 先處理成功的批次（寫入 checkpoint），失敗的最後才丟出
+                    for fut in sorted(done, key=lambda f: f.exception() is not None):
+                        finished(fut)
+            except BaseException:
+                for fut in pending:
+                    fut.cancel()
+                # 已經送出的批次等它跑完，成功的照樣寫 checkpoint，續跑時不必重做
+                for fut in wait(pending)[0]:
+                    if not fut.cancelled() and fut.exception() is None:
+                        finished(fut)
+                raise
+
+        vecs: List[List[float]] = []
+        for batch in results:
+            vecs.extend(batch)
         return vecs
 
     def build(self, items: List[Dict], label_keys: Tuple[str, ...] = ("label", "name", "canonical", "id")):
@@ -105,7 +229,36 @@ class SemanticIndex:
 
         self._labels = labels
         self._items = items
-        self._emb = self.encode(self._labels)
+        self._emb = self.encode_cached(self._labels)
+
+    def encode_cached(self, texts: List[str], batch_size: int = EMBED_BATCH_SIZE) -> List[List[float]]:
+        """
+        先查 embeddings 快取（sha256(model + 文字)），只對沒命中的文字呼叫 API；
+        每批嵌入完就寫回快取（checkpoint），建到一半中斷時下次只補沒做完的批次。
+        texts 先做與 encode 相同的整理（strip、去空值），輸出順序與整理後的 texts 相同。
+        """
+        texts = _coerce_texts(texts)
+        keys = [make_key(self.model_name, t) for t in texts]
+        found = self.cache.get_many(keys) if self.cache is not None else {}
+        reused = len(found)
+
+        todo: Dict[str, str] = {}  # key -> text（相同標籤只嵌入一次）
+        for k, t in zip(keys, texts):
+            if k not in found and k not in todo:
+                todo[k] = t
+        pending = list(todo.items())
+
+        def checkpoint(start: int, chunk: List[str], vecs: List[List[float]]) -> None:
+            batch = [(k, v) for (k, _), v in zip(pending[start:start + len(chunk)], vecs)]
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, batch)
+            found.update(batch)
+
+        if pending:
+            self._encode_batches([t for _, t in pending], batch_size, checkpoint)
+
+        self.build_stats = {"labels": len(texts), "unique": len(set(keys)), "reused": reused, "new": len(pending)}
+        return [found[k] for k in keys]
 
     # 下面這些 getters 讓 build_index.py 可以取用
     def labels(self) -> List[str]:
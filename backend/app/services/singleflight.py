@@ -0,0 +1,54 @@
+# backend/app/services/singleflight.py
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    同一個 key 同時只跑一次：第一個呼叫者（leader）啟動工作，
+    其他同 key 的呼叫者直接等同一個結果（成功或例外都共用）。
+    工作在獨立 task 中執行，leader 斷線不影響其他等待者；所有等待者都取消時才取消工作。
+    只在單一 event loop 內有效（每個 worker process 各自一份）。
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, Tuple[asyncio.Task, list]] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args: Any) -> Tuple[Any, bool]:
+        """回傳 (結果, 是否共用了別人的呼叫)。"""
+        entry = self._calls.get(key)
+        shared = entry is not None
+        if entry is None:
+            task = asyncio.ensure_future(fn(*args))
+            entry = (task, [0])
+            self._calls[key] = entry
+            task.add_done_callback(lambda _t, key=key, entry=entry: self._forget(key, entry))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        task, waiters = entry
+        waiters[0] += 1
+        try:
+            return await asyncio.shield(task), shared
+        except asyncio.CancelledError:
+            if not task.done() and waiters[0] == 1:
+                task.cancel()
+            raise
+        finally:
+            waiters[0] -= 1
+
+    def _forget(self, key: Hashable, entry: Tuple[asyncio.Task, list]) -> None:
+        if self._calls.get(key) is entry:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,220 @@
+# backend/app/services/upload.py
+from __future__ import annotations
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from tempfile import SpooledTemporaryFile
+from typing import Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+try:
+    import multipart  # python-multipart
+    from multipart.multipart import parse_options_header
+except Exception:
+    multipart = None
+    parse_options_header = None
+
+# ===== 可調參數 =====
+# 整個請求 body 的上限（base64 上傳會比原圖大約 1/3，預設留足空間）
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+MAX_UPLOAD_FILES = int(os.getenv("MAX_UPLOAD_FILES", "100"))
+# 每個 part 在記憶體中最多暫存多少，超過就寫到暫存檔
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    """上傳超過 MAX_UPLOAD_BYTES（回 413）。"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+class UploadError(Exception):
+    """multipart 格式錯誤或檔案數過多。"""
+
+
+class TooManyFiles(UploadError):
+    """multipart 檔案數超過 max_files（回 413）。"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"too many files (max {limit})")
+        self.limit = limit
+
+
+class SpooledPart:
+    """邊收邊寫的上傳內容：同時計算 sha256，超過 UPLOAD_SPOOL_BYTES 才落到暫存檔。"""
+
+    def __init__(self, name: str = "", filename: Optional[str] = None, content_type: str = ""):
+        self.name = name
+        self.filename = filename
+        self.content_type = content_type
+        self.size = 0
+        self._sha = hashlib.sha256()
+        self._file = SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+
+    @property
+    def on_disk(self) -> bool:
+        return bool(getattr(self._file, "_rolled", False))
+
+    def write(self, data: bytes) -> None:
+        self._sha.update(data)
+        self._file.write(data)
+        self.size += len(data)
+
+    def sha256(self) -> str:
+        return self._sha.hexdigest()
+
+    def read(self) -> bytes:
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+@dataclass
+class Upload:
+    fields: Dict[str, str] = field(default_factory=dict)
+    files: List[SpooledPart] = field(default_factory=list)
+    body: Optional[SpooledPart] = None  # 非 multipart（JSON / raw）時的整個 body
+    total_bytes: int = 0
+
+    def close(self) -> None:
+        for f in self.files:
+            f.close()
+        if self.body is not None:
+            self.body.close()
+
+
+async def _write(part: SpooledPart, data: bytes) -> None:
+    # 已落到磁碟的檔案改在 threadpool 寫，避免阻塞 event loop
+    if part.on_disk:
+        await run_in_threadpool(part.write, data)
+    else:
+        part.write(data)
+
+
+class _MultipartCollector:
+    """python-multipart 的 callback：檔案 part 寫入 SpooledPart，一般欄位收成字串。"""
+
+    def __init__(self, upload: Upload, max_files: int):
+        self.upload = upload
+        self.max_files = max_files
+        self.pending: List[tuple] = []
+        self._header_name = b""
+        self._header_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._part: Optional[SpooledPart] = None
+        self._field_name = ""
+        self._field_data = bytearray()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._part = None
+        self._field_name = ""
+        self._field_data = bytearray()
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" in options:
+            if len(self.upload.files) >= self.max_files:
+                raise TooManyFiles(self.max_files)
+            self._part = SpooledPart(
+                name=name,
+                filename=options[b"filename"].decode("utf-8", errors="replace"),
+                content_type=self._headers.get(b"content-type", b"").decode("latin-1"),
+            )
+            self.upload.files.append(self._part)
+        else:
+            self._field_name = name
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._part is not None:
+            # 實際寫入在 parse 迴圈中 await（可能要丟 threadpool）
+            self.pending.append((self._part, data[start:end]))
+        else:
+            self._field_data += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self._part is None and self._field_name:
+            self.upload.fields[self._field_name] = self._field_data.decode("utf-8", errors="replace")
+        self._part = None
+
+
+def _content_length(request: Request) -> Optional[int]:
+    try:
+        return int(request.headers.get("content-length", ""))
+    except ValueError:
+        return None
+
+
+async def read_upload(
+    request: Request,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    max_files: int = MAX_UPLOAD_FILES,
+) -> Upload:
+    """
+    以串流方式讀取請求 body：邊讀邊計數，超過 max_bytes 立即丟 UploadTooLarge；
+    multipart 的檔案與 JSON/raw body 都寫進 SpooledPart（邊收邊算 sha256）。
+    """
+    declared = _content_length(request)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLarge(max_bytes)
+
+    ct = request.headers.get("content-type") or ""
+    upload = Upload()
+    try:
+        if "multipart/form-data" in ct.lower() and multipart is not None:
+            _, params = parse_options_header(ct)
+            boundary = params.get(b"boundary")
+            if not boundary:
+                raise UploadError("missing multipart boundary")
+            collector = _MultipartCollector(upload, max_files)
+            parser = multipart.MultipartParser(boundary, collector.callbacks())
+            async for chunk in request.stream():
+                upload.total_bytes += len(chunk)
+                if upload.total_bytes > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                parser.write(chunk)
+                for part, data in collector.pending:
+                    await _write(part, data)
+                collector.pending.clear()
+            parser.finalize()
+        else:
+            upload.body = SpooledPart(content_type=ct)
+            async for chunk in request.stream():
+                upload.total_bytes += len(chunk)
+                if upload.total_bytes > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                await _write(upload.body, chunk)
+    except Exception:
+        upload.close()
+        raise
+    return upload
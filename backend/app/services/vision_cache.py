@@ -0,0 +1,143 @@
+# backend/app/services/vision_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.services.lru import LRUCache, MISSING
+from app.services.openai_client import VISION_CACHE_VERSION
+
+# ===== 可調參數 =====
+VISION_CACHE_SIZE = int(os.getenv("VISION_CACHE_SIZE", "512"))          # 記憶體層筆數上限
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", "86400"))        # 秒；<=0 表示不過期
+# 設定路徑才啟用磁碟層（SQLite），重啟後仍保留
+VISION_CACHE_DB = os.getenv("VISION_CACHE_DB", "")
+VISION_CACHE_DISK_MAX = int(os.getenv("VISION_CACHE_DISK_MAX", "10000"))  # 磁碟層筆數上限
+
+
+def make_key(image: bytes, include_garnish: bool, digest: Optional[str] = None) -> str:
+    """
+    以解碼後的圖片位元組 + include_garnish + 模型/提示版本組成快取鍵。
+    digest 為上傳時串流算好的 sha256（二進位上傳），有給就不再重算。
+    """
+    digest = digest or hashlib.sha256(image).hexdigest()
+    return f"{digest}:{int(bool(include_garnish))}:{VISION_CACHE_VERSION}"
+
+
+class _DiskTier:
+    """SQLite 磁碟層：key -> JSON，含到期時間；超過上限時刪最舊的資料。"""
+
+    def __init__(self, path: str, max_rows: int, ttl: Optional[float]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vision_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " created_at REAL NOT NULL, expires_at REAL)"
+        )
+        self._conn.commit()
+        self._puts = 0
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM vision_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return MISSING
+            value, expires_at = row
+            if expires_at is not None and expires_at <= time.time():
+                self._conn.execute("DELETE FROM vision_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return MISSING
+        return json.loads(value)
+
+    def put(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO vision_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, expires_at),
+            )
+            self._puts += 1
+            # 每 100 次寫入整理一次：清掉過期與超出上限的舊資料
+            if self._puts % 100 == 0:
+                self._conn.execute(
+                    "DELETE FROM vision_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                )
+                self._conn.execute(
+                    "DELETE FROM vision_cache WHERE key IN ("
+                    " SELECT key FROM vision_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vision_cache").fetchone()[0]
+
+
+class VisionCache:
+    """
+    視覺辨識結果快取（存 _post_fixup 之後的 items 與模型名）。
+    記憶體層為 LRU + TTL；若設定 VISION_CACHE_DB 再加上 SQLite 磁碟層。
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float], db_path: str = "", disk_max: int = 10000):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.disk: Optional[_DiskTier] = _DiskTier(db_path, disk_max, ttl) if db_path else None
+        self.disk_hits = 0
+
+    def get_memory(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self.memory.get(key)
+        return None if value is MISSING else value
+
+    def get_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        """查磁碟層；命中時回填記憶體層。會做 I/O，請在 threadpool 內呼叫。"""
+        if self.disk is None:
+            return None
+        value = self.disk.get(key)
+        if value is MISSING:
+            return None
+        self.disk_hits += 1
+        self.memory.put(key, value)
+        return value
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """回傳 (結果, 命中層 'memory'|'disk')；未命中為 (None, None)。"""
+        value = self.get_memory(key)
+        if value is not None:
+            return value, "memory"
+        value = self.get_disk(key)
+        if value is not None:
+            return value, "disk"
+        return None, None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            out["disk"] = {"rows": self.disk.count(), "hits": self.disk_hits}
+        return out
+
+
+cache = VisionCache(
+    maxsize=VISION_CACHE_SIZE,
+    ttl=VISION_CACHE_TTL,
+    db_path=VISION_CACHE_DB,
+    disk_max=VISION_CACHE_DISK_MAX,
+)
@@ -1,24 +1,77 @@
 # backend/main.py
 from __future__ import annotations
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from starlette.responses import JSONResponse, PlainTextResponse
 
-app = FastAPI(title="eatlyze-backend", version="1.0.0")
+from app.services import log, metrics
+from app.services import nutrition_service_v2 as nutrition
+from app.services import openai_client
+
+log.setup()
+logger = log.get_logger("eatlyze")
+
+# --- 啟動暖機：預先載入 foods_tw.csv 與索引，完成前 /ready 回 503 ---
+async def _warm_up(app: FastAPI):
+    try:
+        stats = await asyncio.to_thread(nutrition.warm_up)
+    except Exception as e:
+        logger.error("warmup failed", extra={"error": f"{type(e).__name__}: {e}"})
+        return
+    app.state.warmup = stats
+    app.state.ready = True
+    logger.info("nutrition ready", extra={"warmup": stats})
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    log.setup()  # 已啟動則略過；shutdown 後重新進入 lifespan（測試）時再啟動
+    app.state.ready = False
+    app.state.warmup = None
+    task = asyncio.create_task(_warm_up(app))
+    yield
+    task.cancel()
+    await openai_client.close_async_client()
+    log.shutdown()
+
+
+app = FastAPI(title="eatlyze-backend", version="1.0.0", lifespan=lifespan)
 
 # --- 日誌中介層 ---
+def _route_label(request: Request) -> str:
+    # 用路由樣板而非實際路徑，避免 /image/<檔名> 之類造成 label 爆量
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    print(f">>> {request.method} {request.url.path}")
+    # 沿用上游（負載平衡器 / 前端）給的 request id，沒有就產生一個
+    rid = log.new_request(request.headers.get("x-request-id"))
+    started = time.perf_counter()
     try:
         resp = await call_next(request)
-        print(f"<<< {resp.status_code} {request.url.path}")
+        elapsed = time.perf_counter() - started
+        metrics.REQUEST_SECONDS.observe(
+            elapsed, route=_route_label(request), method=request.method, status=str(resp.status_code),
+        )
+        logger.info(
+            "request",
+            extra={
+                "method": request.method, "path": request.url.path,
+                "status": resp.status_code, "duration_ms": round(elapsed * 1000, 1),
+            },
+        )
+        resp.headers["X-Request-ID"] = rid
         return resp
     except Exception as e:
-        print(f"[ERROR] {request.url.path}: {e}")
+        logger.exception("unhandled error", extra={"path": request.url.path, "error": str(e)})
         # 保證回應（避免 Starlette 進一步處理 bytes）
-        from starlette.responses import JSONResponse
         return JSONResponse(
             {"items": [], "totals": {"kcal": 0, "protein_g": 0, "fat_g": 0, "carb_g": 0}, "error": "server_error"},
             status_code=200,
@@ -30,7 +83,7 @@ _allowed = os.getenv(
     "http://localhost:5173,https://eatlyze-mvp-frontend.onrender.com",
 )
 ALLOWED_ORIGINS = [o.strip() for o in _allowed.split(",") if o.strip()]
-print(f"[CORS] ALLOWED_ORIGINS raw='{_allowed}' parsed={ALLOWED_ORIGINS}")
+logger.info("cors", extra={"allowed_origins": ALLOWED_ORIGINS})
 
 app.add_middleware(
     CORSMiddleware,
@@ -60,3 +113,17 @@ app.include_router(analyze_router.router)
 @app.get("/")
 def root():
     return {"status": "ok", "service": "eatlyze-backend"}
+
+
+# --- 就緒檢查（給負載平衡器；暖機完成前回 503）---
+@app.get("/ready")
+def ready():
+    if not getattr(app.state, "ready", False):
+        return JSONResponse({"ready": False}, status_code=503)
+    return {"ready": True, "warmup": app.state.warmup}
+
+
+# --- Prometheus 指標（各階段、視覺呼叫、名稱查詢的耗時直方圖）---
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,160 @@
+# backend/scripts/bench_ann.py
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, List, Tuple
+
+import numpy as np
+
+# === 把 backend/ 放進 sys.path，才能 import app.services ===
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.services import ann  # noqa: E402
+from app.services import nutrition_service_v2 as v2  # noqa: E402
+
+
+def _perturb(s: str, rnd: random.Random) -> str:
+    """模擬模型輸出與表上名稱的差異：刪一個字、換一個字或加複數。"""
+    if len(s) < 3:
+        return s + "s"
+    i = rnd.randrange(len(s))
+    op = rnd.choice(("drop", "swap", "plural"))
+    if op == "drop":
+        return s[:i] + s[i + 1:]
+    if op == "swap":
+        return s[:i] + rnd.choice("aeiou") + s[i + 1:]
+    return s + "s"
+
+
+def hashing_embed(texts: List[str], dim: int = 256) -> np.ndarray:
+    """
+    不需 API 的本機嵌入：字元 1~3-gram 做 feature hashing（帶正負號），再正規化。
+    只用來測 ANN 的召回與速度，語意品質不及真正的 embeddings。
+    """
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for r, text in enumerate(texts):
+        s = f" {v2._norm(text)} "
+        for n in (1, 2, 3):
+            for j in range(len(s) - n + 1):
+                h = int.from_bytes(hashlib.blake2b(s[j:j + n].encode("utf-8"), digest_size=8).digest(), "little")
+                out[r, h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.where(norms == 0, 1.0, norms)
+
+
+def openai_embed(texts: List[str], model: str) -> np.ndarray:
+    from app.services.semvec import SemanticIndex
+
+    vecs = np.asarray(SemanticIndex(model_name=model).encode(texts), dtype=np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _labels() -> List[str]:
+    """foods_tw.csv 的所有名稱（name / canonical / 去括號）加上英中別名。"""
+    t = v2._state().table
+    seen, out = set(), []
+    for i in range(t.n_csv):
+        for n in v2._names_for_row(t, i):
+            if n and n not in seen:
+                seen.add(n)
+                out.append(n)
+    for n in v2.ALIAS_RAW:
+        if n not in seen:
+            seen.add(n)
+            out.append(n)
+    return out
+
+
+def _scale(matrix: np.ndarray, factor: int, rng) -> np.ndarray:
+    """把詞彙量放大 factor 倍（每個向量加小雜訊複製），模擬多國食物表。"""
+    if factor <= 1:
+        return matrix
+    copies = [matrix] + [matrix + rng.normal(scale=0.15 / np.sqrt(matrix.shape[1]), size=matrix.shape).astype(np.float32)
+                         for _ in range(factor - 1)]
+    out = np.concatenate(copies)
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+def _run(search: Callable[[Any, int], Tuple[Any, Any]], queries: np.ndarray, k: int) -> Tuple[List[List[int]], float]:
+    results = []
+    t0 = time.perf_counter()
+    for q in queries:
+        ids, _ = search(q, k)
+        results.append([int(i) for i in ids])
+    return results, time.perf_counter() - t0
+
+
+def _recall(found: List[List[int]], truth: List[List[int]], k: int) -> float:
+    hit = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hit / max(1, sum(min(k, len(t)) for t in truth))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark ANN backends (recall@1/@5, QPS) against exact cosine search")
+    ap.add_argument("--embed", choices=("hashing", "openai"), default="hashing",
+                    help="hashing：本機 n-gram 雜湊向量；openai：呼叫 embeddings API（需 OPENAI_API_KEY）")
+    ap.add_argument("--model", default=os.getenv("EMBED_MODEL", "text-embedding-3-small"))
+    ap.add_argument("--dim", type=int, default=256, help="hashing 向量維度")
+    ap.add_argument("--scale", type=int, default=1, help="把詞彙量放大幾倍（模擬更大的食物表）")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--nprobe", default="1,2,4,8,16,32", help="IVF 要測的 nprobe（逗號分隔）")
+    ap.add_argument("--ef", default="16,32,64,128", help="HNSW 要測的 ef（逗號分隔）")
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    rng = np.random.default_rng(args.seed)
+    labels = _labels()
+    query_texts = [_perturb(rnd.choice(labels), rnd) for _ in range(args.queries)]
+
+    t0 = time.perf_counter()
+    if args.embed == "openai":
+        vecs = openai_embed(labels + query_texts, args.model)
+    else:
+        vecs = hashing_embed(labels + query_texts, args.dim)
+    matrix, queries = vecs[:len(labels)], vecs[len(labels):]
+    matrix = _scale(matrix, args.scale, rng)
+    print(f"[data] labels={len(labels)} vectors={len(matrix)} dim={matrix.shape[1]} queries={len(queries)} "
+          f"embed={args.embed} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    print(f"[ann] available: {ann.available()}")
+
+    exact = ann.ExactIndex(matrix)
+    truth, t_exact = _run(exact.search, queries, 5)
+    qps_exact = len(queries) / t_exact
+    print(f"  {'backend':<8} {'params':<34} {'build ms':>9} {'R@1':>6} {'R@5':>6} {'QPS':>9} {'vs exact':>8}")
+
+    def report(name: str, params: str, build_s: float, search) -> None:
+        found, t = _run(search, queries, 5)
+        qps = len(queries) / t
+        print(f"  {name:<8} {params:<34} {build_s * 1000:9.0f} {_recall(found, truth, 1):6.3f} "
+              f"{_recall(found, truth, 5):6.3f} {qps:9.0f} {qps / qps_exact:7.1f}x")
+
+    report("exact", "", 0.0, exact.search)
+
+    t0 = time.perf_counter()
+    ivf = ann.IVFIndex(matrix, nlist=ann.SEMANTIC_ANN_NLIST)
+    t_build = time.perf_counter() - t0
+    for nprobe in (int(x) for x in args.nprobe.split(",") if x):
+        report("ivf", f"nlist={ivf.nlist} nprobe={nprobe}", t_build, lambda q, k, n=nprobe: ivf.search(q, k, nprobe=n))
+
+    for name, cls in (("hnsw", ann.HnswIndex), ("faiss", ann.FaissIndex)):
+        if not ann.available()[name]:
+            print(f"  {name:<8} (not installed)")
+            continue
+        t0 = time.perf_counter()
+        index = cls(matrix)
+        t_build = time.perf_counter() - t0
+        for ef in (int(x) for x in args.ef.split(",") if x):
+            report(name, f"M={index.m} ef={ef}", t_build, lambda q, k, e=ef, ix=index: ix.search(q, k, ef=e))
+
+
+if __name__ == "__main__":
+    main()
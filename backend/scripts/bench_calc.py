@@ -0,0 +1,77 @@
+# backend/scripts/bench_calc.py
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Dict, List
+
+# === 把 backend/ 放進 sys.path，才能 import app.services ===
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.services import nutrition_service_v2 as v2  # noqa: E402
+
+# 模型常見的輸出（混合精確、別名、模糊與查無）
+LLM_CANONICALS = [
+    "white rice", "fried egg", "bean sprouts", "braised pork", "fried noodles",
+    "miso soup", "spring onion", "shredded carrot", "grilled salmon", "chicken breast",
+    "boiled egg", "cabbage", "tofu", "broccoli", "sweet potato", "dumplings",
+    "滷肉飯", "炒青菜", "荷包蛋", "白飯", "高麗菜", "unknown thing",
+]
+
+
+def _meals(n: int, rnd: random.Random) -> List[List[Dict]]:
+    t = v2._state().table
+    names = [t.names[i] for i in range(t.n_csv) if t.names[i]] + LLM_CANONICALS
+    meals = []
+    for _ in range(n):
+        items = []
+        for _ in range(rnd.randint(2, 6)):
+            nm = rnd.choice(names)
+            items.append({
+                "name": nm,
+                "canonical": nm,
+                "weight_g": round(rnd.uniform(5, 400), rnd.choice((0, 1, 2))),
+                "is_garnish": rnd.random() < 0.1,
+            })
+        meals.append(items)
+    return meals
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark nutrition calc: calc() per meal vs vectorized calc_many()")
+    ap.add_argument("--meals", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--garnish", action="store_true", help="include_garnish=True")
+    ap.add_argument("--repeat", type=int, default=3, help="各跑幾次取最快（名稱解析快取已暖）")
+    args = ap.parse_args()
+
+    v2._state()
+    meals = _meals(args.meals, random.Random(args.seed))
+    n_items = sum(len(m) for m in meals)
+
+    def best(fn):
+        out, best_s = None, float("inf")
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            out = fn()
+            best_s = min(best_s, time.perf_counter() - t0)
+        return out, best_s
+
+    loop, t_loop = best(lambda: [v2.calc(m, include_garnish=args.garnish) for m in meals])
+    many, t_many = best(lambda: v2.calc_many(meals, include_garnish=args.garnish))
+
+    same = sum(a == b for a, b in zip(loop, many))
+    print(f"[calc] meals={len(meals)} items={n_items} numpy={'yes' if v2.np is not None else 'no'}")
+    print(f"  calc loop : {t_loop * 1000:8.1f} ms  ({len(meals) / t_loop:,.0f} meals/s)")
+    print(f"  calc_many : {t_many * 1000:8.1f} ms  ({len(meals) / t_many:,.0f} meals/s)")
+    print(f"  speedup   : {t_loop / max(t_many, 1e-9):.1f}x  identical={same}/{len(meals)}")
+
+
+if __name__ == "__main__":
+    main()
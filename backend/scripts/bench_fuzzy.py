@@ -0,0 +1,130 @@
+# backend/scripts/bench_fuzzy.py
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import get_close_matches
+from typing import Any, Callable, List, Optional, Tuple
+
+# === 把 backend/ 放進 sys.path，才能 import app.services ===
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.services import nutrition_service as v1  # noqa: E402
+from app.services import nutrition_service_v2 as v2  # noqa: E402
+
+# 模型常見的輸出（多數在 CSV 找不到精確名稱，會落到模糊比對）
+LLM_CANONICALS = [
+    "stir-fried greens", "white rice", "fried egg", "bean sprouts", "braised pork",
+    "fried noodles", "miso soup", "spring onion", "shredded carrot", "grilled salmon",
+    "chicken breast", "boiled egg", "steamed fish", "pork chop", "cabbage",
+    "tofu", "broccoli", "corn", "sweet potato", "beef noodle soup",
+    "dumplings", "scallion pancake", "pickled vegetables", "soy milk", "rice noodles",
+    "滷肉飯", "炒青菜", "荷包蛋", "白飯", "高麗菜",
+]
+
+
+def _perturb(s: str, rnd: random.Random) -> str:
+    """模擬拼字差異：刪一個字、換一個字或加複數。"""
+    if len(s) < 3:
+        return s + "s"
+    i = rnd.randrange(len(s))
+    op = rnd.choice(("drop", "swap", "plural"))
+    if op == "drop":
+        return s[:i] + s[i + 1:]
+    if op == "swap":
+        return s[:i] + rnd.choice("aeiou") + s[i + 1:]
+    return s + "s"
+
+
+def _legacy_v2(name: str, cutoff: float = 0.66) -> Optional[int]:
+    """原本 nutrition_service_v2._fuzzy_find：每次重建候選清單後全表比對。"""
+    key = v2._norm(name)
+    if not key:
+        return None
+    t = v2._state().table
+    cand: List[Tuple[str, int]] = []
+    for i in range(t.n_csv):
+        for n in v2._names_for_row(t, i):
+            cand.append((v2._norm(n), i))
+    corpus = [c[0] for c in cand if c[0]]
+    hits = get_close_matches(key, corpus, n=1, cutoff=cutoff)
+    if hits:
+        for k, i in cand:
+            if k == hits[0]:
+                return i
+    return None
+
+
+def _legacy_v1(name: str, cutoff: float = 0.65) -> Optional[dict]:
+    """原本 nutrition_service._fuzzy_find（pool=_FOODS）。"""
+    key = v1._norm(name)
+    if not key:
+        return None
+    cand: List[Tuple[str, dict]] = []
+    for r in v1._FOODS:
+        for n in v1._all_names_for_row(r):
+            cand.append((v1._norm(n), r))
+    corpus = [c[0] for c in cand if c[0]]
+    hits = get_close_matches(key, corpus, n=1, cutoff=cutoff)
+    if hits:
+        for k, r in cand:
+            if k == hits[0]:
+                return r
+    return None
+
+
+def _run(fn: Callable[[str], Any], queries: List[str]) -> Tuple[float, List[Any]]:
+    t0 = time.perf_counter()
+    out = [fn(q) for q in queries]
+    return time.perf_counter() - t0, out
+
+
+def _report(tag: str, queries: List[str], legacy, fast, label: Callable[[Any], Any]) -> None:
+    t_old, r_old = _run(legacy, queries)
+    t_new, r_new = _run(fast, queries)
+    same = sum(1 for a, b in zip(r_old, r_new) if a == b)
+    n = len(queries)
+    print(f"[{tag}] queries={n}")
+    print(f"  legacy : {t_old * 1000 / n:8.2f} ms/query  hits={sum(r is not None for r in r_old)}")
+    print(f"  indexed: {t_new * 1000 / n:8.2f} ms/query  hits={sum(r is not None for r in r_new)}")
+    print(f"  speedup: {t_old / max(t_new, 1e-9):.1f}x  agreement={same}/{n} ({same * 100.0 / n:.1f}%)")
+    for q, a, b in zip(queries, r_old, r_new):
+        if a != b:
+            print(f"    diff {q!r}: legacy={label(a)!r} indexed={label(b)!r}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark fuzzy food matching: legacy difflib scan vs n-gram index")
+    ap.add_argument("--samples", type=int, default=200, help="由 CSV 名稱擾動產生的查詢數")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+
+    t0 = time.perf_counter()
+    st = v2._state()
+    print(f"[load] v2 rows={st.table.n_csv} fuzzy keys={len(st.fuzzy)} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+    t0 = time.perf_counter()
+    v1._ensure_loaded()
+    print(f"[load] v1 rows={len(v1._FOODS)} fuzzy keys={len(v1._FUZZY)} in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    t = v2._state().table
+    names: List[str] = []
+    for i in range(t.n_csv):
+        names.extend(n for n in v2._names_for_row(t, i) if n)
+    queries = list(LLM_CANONICALS) + [_perturb(rnd.choice(names), rnd) for _ in range(args.samples)]
+
+    _report("v2 cutoff=0.66", queries, _legacy_v2, v2._fuzzy_find,
+            lambda i: None if i is None else t.names[i])
+    _report("v1 cutoff=0.65", queries, _legacy_v1, v1._fuzzy_find,
+            lambda r: r and r.get("name"))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ from __future__ import annotations
 import os
 import sys
 import json
-import pickle
+import argparse
 from typing import List, Dict
 
 # === 自動定位路徑：把 backend/ 放進 sys.path，才能 import app.services ===
@@ -23,11 +23,14 @@ print(f"[path] PROJECT_ROOT = {PROJECT_ROOT}")
 print(f"[path] has app/services/semvec.py? {os.path.exists(os.path.join(BACKEND_DIR,'app','services','semvec.py'))}")
 
 # === 匯入語意索引 ===
-from app.services.semvec import SemanticIndex  # now resolvable
+from app.services.semvec import EMBED_CONCURRENCY, EMBED_TPM, SemanticIndex  # now resolvable
+from app.services import sem_store
+from app.services.embed_cache import EMBED_CACHE_PATH, EmbeddingCache, make_key
 
 # === 檔案路徑 ===
 ONTO_PATH = os.path.join(BACKEND_DIR, "app", "data", "food_ontology.json")
-OUT_PATH  = os.path.join(BACKEND_DIR, "app", "data", "sem_index.pkl")
+# 輸出 sem_index.<sha>.npy（向量）+ sem_index.json（labels / items / model，指向向量檔）
+OUT_PREFIX = os.path.join(BACKEND_DIR, "app", "data", "sem_index")
 
 def load_ontology(path: str) -> List[Dict]:
     if not os.path.exists(path):
@@ -39,6 +42,17 @@ def load_ontology(path: str) -> List[Dict]:
     return data
 
 def main():
+    ap = argparse.ArgumentParser(description="Embed food_ontology.json into the semantic index")
+    ap.add_argument("--dtype", choices=sem_store.DTYPES, default="float32",
+                    help="向量存放格式；float16 / int8 較省空間，查詢時多一次轉換")
+    ap.add_argument("--cache", default=EMBED_CACHE_PATH,
+                    help="embeddings 快取（SQLite）；只嵌入新增或改過的標籤。給空字串則全部重新嵌入")
+    ap.add_argument("--prune-cache", action="store_true",
+                    help="建完後從快取刪掉不在這次索引中的向量（已刪除 / 改名的標籤、其他模型）")
+    ap.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY, help="同時送出的 embeddings 批次數")
+    ap.add_argument("--tpm", type=int, default=EMBED_TPM, help="每分鐘 token 預算（0 表示不限）")
+    args = ap.parse_args()
+
     print(f"[build] loading ontology: {ONTO_PATH}")
     items = load_ontology(ONTO_PATH)
 
@@ -56,21 +70,36 @@ def main():
             "carb_g": it.get("carb_g"),
         })
 
-    idx = SemanticIndex()  # 會使用環境變數 OPENAI_API_KEY
+    # 舊索引的標籤，用來統計這次移除了幾個
+    try:
+        previous = set(sem_store.load(OUT_PREFIX).labels)
+    except Exception:
+        previous = set()
+
+    cache = EmbeddingCache(args.cache) if args.cache else None
+    idx = SemanticIndex(cache=cache, concurrency=args.concurrency, tpm=args.tpm)  # 會使用環境變數 OPENAI_API_KEY
     idx.build(slim_items)
+    st = idx.build_stats
+    removed = len(previous - set(idx.labels()))
+    print(f"[build] labels {st['labels']} (unique {st['unique']}): reused {st['reused']}, new {st['new']}, removed {removed}")
 
-    payload = {
-        "labels": idx.labels(),
-        "embeddings": idx.embeddings(),
-        "items": idx.items(),
-        "model": idx.model_name,
-    }
+    meta = sem_store.save(
+        OUT_PREFIX,
+        labels=idx.labels(),
+        embeddings=idx.embeddings(),
+        items=idx.items(),
+        model=idx.model_name,
+        dtype=args.dtype,
+    )
 
-    os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
-    with open(OUT_PATH, "wb") as f:
-        pickle.dump(payload, f)
+    if cache is not None:
+        if args.prune_cache:
+            pruned = cache.prune(make_key(idx.model_name, t) for t in idx.labels())
+            print(f"[cache] pruned {pruned} stale vectors")
+        print(f"[cache] {cache.count()} vectors in {args.cache}")
+        cache.close()
 
-    print(f"[build] ✅ index saved to {OUT_PATH}, total {len(payload['labels'])} items.")
+    print(f"[build] ✅ index saved to {sem_store.vectors_path(OUT_PREFIX, meta)} + .json ({meta['dtype']}, dim {meta['dim']}), total {meta['count']} items.")
 
 if __name__ == "__main__":
     main()
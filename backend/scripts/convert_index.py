@@ -0,0 +1,54 @@
+# backend/scripts/convert_index.py
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+
+# === 把 backend/ 放進 sys.path，才能 import app.services ===
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(CURRENT_DIR, ".."))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from app.services import sem_store  # noqa: E402
+
+DEFAULT_SRC = os.path.join(BACKEND_DIR, "app", "data", "sem_index.pkl")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert a pickled sem_index.pkl into sem_index.<sha>.npy + sem_index.json")
+    ap.add_argument("src", nargs="?", default=DEFAULT_SRC)
+    ap.add_argument("--out", default=None, help="輸出 prefix（預設與來源同名）")
+    ap.add_argument("--dtype", choices=sem_store.DTYPES, default="float32")
+    ap.add_argument("--remove-pickle", action="store_true", help="轉換並驗證成功後刪除 .pkl")
+    args = ap.parse_args()
+
+    prefix = args.out or sem_store.prefix_of(args.src)
+    t0 = time.perf_counter()
+    old = sem_store.load_pickle(args.src)
+    t_pickle = time.perf_counter() - t0
+    meta = sem_store.save(prefix, old.labels, old.matrix, old.items, old.model, dtype=args.dtype)
+
+    t0 = time.perf_counter()
+    new = sem_store.load(prefix)
+    t_binary = time.perf_counter() - t0
+
+    # 驗證：labels 相同、每個向量與自己的 cosine 最高
+    assert new.labels == old.labels and len(new) == len(old)
+    worst = min(float(new.scores(old.matrix[i])[i]) for i in range(len(old))) if len(old) else 1.0
+    npy_path = sem_store.vectors_path(prefix, meta)
+    print(f"[convert] {args.src} -> {npy_path} + {prefix}.json ({meta['dtype']}, {meta['count']} x {meta['dim']})")
+    print(f"  size   : {os.path.getsize(args.src) / 1024:.0f} KiB -> "
+          f"{(os.path.getsize(npy_path) + os.path.getsize(prefix + '.json')) / 1024:.0f} KiB")
+    print(f"  load   : pickle {t_pickle * 1000:.1f} ms, binary (mmap) {t_binary * 1000:.1f} ms")
+    print(f"  min self-cosine: {worst:.5f}")
+
+    if args.remove_pickle and os.path.abspath(args.src) != os.path.abspath(npy_path):
+        os.remove(args.src)
+        print(f"  removed {args.src}")
+
+
+if __name__ == "__main__":
+    main()